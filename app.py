@@ -1,8 +1,107 @@
 import streamlit as st
 from src.trends_scraper import TrendsScraper
 from src.article_generator import ArticleGenerator
-from src.utils import load_css, get_plotly_chart
+from src.article_cache import ArticleCache
+from src.dedup import NearDuplicateDetector
+from src.utils import load_css, get_plotly_chart, get_region_choropleth, get_city_map
+from src.topic_index import TopicIndex
+from src.regional import RegionalExplorer
+from src.rate_limit import SharedRequestBudget
+from src.work_queue import DEFAULT_QUEUE_PATH
+from src.session_cache import BoundedCache, frame_hash
+from src.keywords import parse_keywords, keywords_key
+from src.snapshots import SnapshotStore, SnapshotDiff
 import pandas as pd
+import time
+
+# Per-session memory caps; the least recently used entries are evicted first
+MAX_DATASETS = 5
+MAX_DATASET_BYTES = 100 * 1024 * 1024
+MAX_ARTICLES = 50
+MAX_FIGURES = 20
+
+# Seconds fetched data is reused when the same search is run again
+DATASET_TTL = 15 * 60
+
+SECTIONS = ["Trends Overview", "Related Topics", "Related Queries", "Regional Interest", "Generated Articles", "Keyword Discovery", "Compare Snapshots"]
+
+@st.cache_resource
+def get_topic_index():
+    """Load the persistent topic index once per server process."""
+    return TopicIndex.load()
+
+@st.cache_resource
+def get_article_cache():
+    """Open the on-disk article cache once per server process."""
+    return ArticleCache()
+
+@st.cache_resource
+def get_request_budget():
+    """Draw on the same Google Trends request budget as the HTTP service and workers."""
+    return SharedRequestBudget(DEFAULT_QUEUE_PATH)
+
+@st.cache_resource
+def get_regional_explorer():
+    """Share one regional explorer, and its cache, across sessions."""
+    return RegionalExplorer(budget=get_request_budget())
+
+@st.cache_resource
+def get_snapshot_store():
+    """Open the on-disk snapshot store once per server process."""
+    return SnapshotStore()
+
+@st.cache_resource(max_entries=32)
+def load_snapshot(snapshot_id):
+    """Snapshots never change once written, so each is read from disk once per server process."""
+    return get_snapshot_store().load(snapshot_id)
+
+@st.cache_resource(max_entries=32)
+def diff_snapshots(old_id, new_id):
+    """Diff two snapshots once and share the result across sessions."""
+    return SnapshotDiff(load_snapshot(old_id), load_snapshot(new_id))
+
+def memoized_figure(key, builder, *args):
+    """
+    Build a Plotly figure once per session and reuse it on later reruns.
+    
+    Args:
+        key (tuple): Identity of the figure, including a hash of its data
+        builder (callable): Function that creates the figure
+        *args: Arguments for builder
+        
+    Returns:
+        plotly.graph_objects.Figure: The cached or newly built figure
+    """
+    fig = st.session_state.figures.get(key)
+    if fig is None:
+        fig = builder(*args)
+        st.session_state.figures.put(key, fig)
+    return fig
+
+def display_related(store, keywords, source, label):
+    """
+    Show the rising and top related topics or queries for every keyword.
+    
+    Args:
+        store (RelatedStore): Related data from the last search
+        keywords (list): Keywords that were searched, including ones without related data
+        source (str): 'topic' or 'query'
+        label (str): Plural label used in headings ("Topics" or "Queries")
+    """
+    if store is None or len(store) == 0:
+        st.info(f"No related {label.lower()} data available.")
+        return
+    
+    for keyword in keywords:
+        st.subheader(f"{label} related to '{keyword}'")
+        
+        for kind in ('rising', 'top'):
+            st.write(f"{kind.title()} {label}")
+            rows = store.view(keyword, source, kind)
+            if not rows.empty:
+                st.dataframe(rows[['rank', 'text', 'value']], hide_index=True, use_container_width=True)
+            else:
+                st.info(f"No {kind} {label.lower()} found.")
 
 def main():
     # Page configuration must be the first Streamlit command
@@ -62,54 +161,95 @@ def main():
         article_length_options = ["Short (300-500 words)", "Medium (500-800 words)", "Long (800-1200 words)"]
         article_length = st.selectbox("Article Length", article_length_options)
         
+        # The same seed and inputs always produce the same article
+        article_seed = int(st.number_input("Article Seed", min_value=0, value=0, step=1))
+        
         # Search button
         search_button = st.button("Get Trends Data", type="primary")
+        refresh_button = st.button("Refresh Data", help="Fetch again even if these keywords were fetched recently")
     
     # Initialize session state variables if they don't exist
-    if 'trends_data' not in st.session_state:
-        st.session_state.trends_data = None
-    if 'related_topics' not in st.session_state:
-        st.session_state.related_topics = None
-    if 'related_queries' not in st.session_state:
-        st.session_state.related_queries = None
+    if 'datasets' not in st.session_state:
+        st.session_state.datasets = BoundedCache(max_items=MAX_DATASETS, max_bytes=MAX_DATASET_BYTES)
+    if 'dataset_key' not in st.session_state:
+        st.session_state.dataset_key = None
+    if 'article_dedup' not in st.session_state:
+        st.session_state.article_dedup = NearDuplicateDetector(threshold=0.8)
     if 'articles' not in st.session_state:
-        st.session_state.articles = {}
+        # Evicted articles also leave the near-duplicate index
+        st.session_state.articles = BoundedCache(
+            max_items=MAX_ARTICLES,
+            on_evict=lambda key, _: st.session_state.article_dedup.remove(key)
+        )
+    if 'figures' not in st.session_state:
+        st.session_state.figures = BoundedCache(max_items=MAX_FIGURES)
     
     # Process search when button is clicked
-    if search_button:
-        with st.spinner("Fetching trends data..."):
-            # Prepare search parameters
-            kw_list = [k.strip() for k in keywords.split(",")]
-            tf = timeframe_options[timeframe]
-            geo = region_options[region]
-            
-            # Initialize scraper and get trends data
-            scraper = TrendsScraper()
-            try:
-                trends_data = scraper.get_interest_over_time(kw_list, tf, geo)
-                related_topics = scraper.get_related_topics(kw_list, tf, geo)
-                related_queries = scraper.get_related_queries(kw_list, tf, geo)
-                
-                # Store in session state
-                st.session_state.trends_data = trends_data
-                st.session_state.related_topics = related_topics
-                st.session_state.related_queries = related_queries
-                
-                st.success("Data fetched successfully!")
-            except Exception as e:
-                st.error(f"Error fetching trends data: {str(e)}")
+    if search_button or refresh_button:
+        # Prepare search parameters
+        kw_list = parse_keywords(keywords)
+        tf = timeframe_options[timeframe]
+        geo = region_options[region]
+        
+        # The same keywords in any order or casing reuse recent data fetched this session
+        dataset_key = (keywords_key(kw_list), tf, geo)
+        cached = st.session_state.datasets.get(dataset_key)
+        age = time.time() - cached['fetched_at'] if cached is not None else None
+        
+        if not kw_list:
+            st.warning("Enter at least one keyword.")
+        elif not refresh_button and age is not None and age < DATASET_TTL:
+            st.session_state.dataset_key = dataset_key
+            st.success(f"Loaded data fetched {int(age // 60)} min ago. Click 'Refresh Data' to fetch it again.")
+        else:
+            with st.spinner("Fetching trends data..."):
+                # Initialize scraper and get trends data
+                scraper = TrendsScraper(budget=get_request_budget())
+                try:
+                    trends_data = scraper.get_interest_over_time(kw_list, tf, geo)
+                    related = scraper.get_related_store(kw_list, tf, geo)
+                    
+                    # Store in session state
+                    st.session_state.datasets.put(dataset_key, {
+                        'keywords': kw_list,
+                        'timeframe': tf,
+                        'geo': geo,
+                        'interest': trends_data,
+                        'interest_hash': frame_hash(trends_data),
+                        'related': related,
+                        'regional': None,
+                        'fetched_at': time.time()
+                    })
+                    st.session_state.dataset_key = dataset_key
+                    
+                    # Keep every scrape in the persistent topic index
+                    topic_index = get_topic_index()
+                    topic_index.ingest_store(related)
+                    topic_index.flush()
+                    
+                    # Snapshot every scrape so it can be compared with later ones (empty, failed scrapes are skipped)
+                    get_snapshot_store().save(trends_data, related, kw_list, tf, geo)
+                    
+                    if related.failed:
+                        st.warning(f"Could not fetch related data for: {', '.join(related.failed_keywords)}")
+                    st.success("Data fetched successfully!")
+                except Exception as e:
+                    st.error(f"Error fetching trends data: {str(e)}")
+    
+    # The current dataset is always the most recently used, so eviction never removes it
+    dataset = st.session_state.datasets.get(st.session_state.dataset_key)
     
     # Display trends data if available
-    if st.session_state.trends_data is not None:
-        # Display the data in tabs
-        tab1, tab2, tab3, tab4 = st.tabs(["Trends Overview", "Related Topics", "Related Queries", "Generated Articles"])
+    if dataset is not None:
+        # Only the selected section is rendered, so reruns don't repaint every table and chart
+        view = st.radio("View", SECTIONS, horizontal=True, key="view", label_visibility="collapsed")
         
-        with tab1:
+        if view == "Trends Overview":
             st.header("Trends Overview")
-            trends_df = st.session_state.trends_data
+            trends_df = dataset['interest']
             
             # Create visualization
-            fig = get_plotly_chart(trends_df)
+            fig = memoized_figure(('interest', dataset['interest_hash']), get_plotly_chart, trends_df)
             st.plotly_chart(fig, use_container_width=True)
             
             # Show the data table
@@ -117,7 +257,11 @@ def main():
             st.dataframe(trends_df, use_container_width=True)
             
             # Download button for trends data
-            csv = trends_df.to_csv(index=True)
+            if 'csv' not in dataset:
+                dataset['csv'] = trends_df.to_csv(index=True)
+                # Re-store so the dataset's size accounts for the CSV
+                st.session_state.datasets.put(st.session_state.dataset_key, dataset)
+            csv = dataset['csv']
             st.download_button(
                 label="Download Trends Data as CSV",
                 data=csv,
@@ -125,64 +269,83 @@ def main():
                 mime="text/csv"
             )
         
-        with tab2:
+        elif view == "Related Topics":
             st.header("Related Topics")
-            if st.session_state.related_topics:
-                for keyword in st.session_state.related_topics:
-                    st.subheader(f"Topics related to '{keyword}'")
-                    
-                    # Rising topics
-                    if 'rising' in st.session_state.related_topics[keyword]:
-                        st.write("Rising Topics")
-                        rising_df = st.session_state.related_topics[keyword]['rising']
-                        if rising_df is not None and not rising_df.empty:
-                            st.dataframe(rising_df, use_container_width=True)
-                        else:
-                            st.info("No rising topics found.")
-                    
-                    # Top topics
-                    if 'top' in st.session_state.related_topics[keyword]:
-                        st.write("Top Topics")
-                        top_df = st.session_state.related_topics[keyword]['top']
-                        if top_df is not None and not top_df.empty:
-                            st.dataframe(top_df, use_container_width=True)
-                        else:
-                            st.info("No top topics found.")
-            else:
-                st.info("No related topics data available.")
+            display_related(dataset['related'], dataset['keywords'], 'topic', "Topics")
         
-        with tab3:
+        elif view == "Related Queries":
             st.header("Related Queries")
-            if st.session_state.related_queries:
-                for keyword in st.session_state.related_queries:
-                    st.subheader(f"Queries related to '{keyword}'")
-                    
-                    # Rising queries
-                    if 'rising' in st.session_state.related_queries[keyword]:
-                        st.write("Rising Queries")
-                        rising_df = st.session_state.related_queries[keyword]['rising']
-                        if rising_df is not None and not rising_df.empty:
-                            st.dataframe(rising_df, use_container_width=True)
-                        else:
-                            st.info("No rising queries found.")
-                    
-                    # Top queries
-                    if 'top' in st.session_state.related_queries[keyword]:
-                        st.write("Top Queries")
-                        top_df = st.session_state.related_queries[keyword]['top']
-                        if top_df is not None and not top_df.empty:
-                            st.dataframe(top_df, use_container_width=True)
-                        else:
-                            st.info("No top queries found.")
+            display_related(dataset['related'], dataset['keywords'], 'query', "Queries")
+        
+        elif view == "Regional Interest":
+            st.header("Regional Interest")
+            
+            if st.button("Load Regional Data"):
+                with st.spinner("Fetching state, metro and city data..."):
+                    regional = get_regional_explorer().fetch(dataset['keywords'], dataset['timeframe'])
+                    dataset['regional'] = regional
+                    # Each figure is memoized on the frame it plots
+                    dataset['regional_hashes'] = {level: frame_hash(regional.level(level)) for level in ('REGION', 'CITY')}
+                    # Re-store so the dataset's size accounts for the regional frames
+                    st.session_state.datasets.put(st.session_state.dataset_key, dataset)
+            
+            regional = dataset['regional']
+            if regional is None:
+                st.info("Click 'Load Regional Data' to fetch interest by state, metro area (DMA) and city.")
             else:
-                st.info("No related queries data available.")
+                region_keyword = st.selectbox("Keyword", regional.keywords, key="region_keyword")
+                states = regional.level('REGION')
+                
+                if not states.empty and region_keyword in states.columns:
+                    fig = memoized_figure(
+                        ('choropleth', dataset['regional_hashes']['REGION'], region_keyword),
+                        get_region_choropleth, states, region_keyword
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.info("No state-level data available.")
+                
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    # State averages rolled up from metro areas, no extra request needed
+                    st.subheader("Metro Areas Rolled Up by State")
+                    rollup = regional.rollup()
+                    if not rollup.empty and region_keyword in rollup.columns:
+                        st.dataframe(
+                            rollup[[region_keyword, 'markets']].sort_values(region_keyword, ascending=False),
+                            use_container_width=True
+                        )
+                        
+                        state_code = st.selectbox("Drill down into state", rollup.index.tolist())
+                        markets = regional.drilldown(state_code)
+                        st.dataframe(
+                            markets[[region_keyword]].sort_values(region_keyword, ascending=False),
+                            use_container_width=True
+                        )
+                    else:
+                        st.info("No metro area data available.")
+                
+                with col2:
+                    st.subheader("Cities")
+                    cities = regional.level('CITY')
+                    if not cities.empty and region_keyword in cities.columns and 'lat' in cities.columns:
+                        fig = memoized_figure(
+                            ('cities', dataset['regional_hashes']['CITY'], region_keyword),
+                            get_city_map, cities, region_keyword
+                        )
+                        st.plotly_chart(fig, use_container_width=True)
+                    elif not cities.empty and region_keyword in cities.columns:
+                        st.dataframe(cities[[region_keyword]], use_container_width=True)
+                    else:
+                        st.info("No city data available.")
         
-        with tab4:
+        elif view == "Generated Articles":
             st.header("Generated Articles")
             st.info("Select a keyword to generate an article about.")
             
             # Get keyword list
-            kw_list = [k.strip() for k in keywords.split(",")]
+            kw_list = dataset['keywords']
             
             # Two columns for selection and generation
             col1, col2 = st.columns([1, 2])
@@ -199,37 +362,61 @@ def main():
                 else:
                     word_count = "long"
                 
+                # Articles are kept per keyword, tone, length and seed
+                article_key = (selected_keyword, article_tone.lower(), word_count, article_seed)
+                
                 # Generate button
                 generate_btn = st.button("Generate Article", type="primary")
                 
                 if generate_btn:
                     with st.spinner("Generating article..."):
                         # Get the related data for context
-                        related_topics_data = st.session_state.related_topics.get(selected_keyword, {})
-                        related_queries_data = st.session_state.related_queries.get(selected_keyword, {})
+                        related_topics_data = dataset['related'].view(selected_keyword, 'topic')
+                        related_queries_data = dataset['related'].view(selected_keyword, 'query')
+                        
+                        # Use real regional data for the geographic insight when it has been loaded
+                        region_data = None
+                        if dataset['regional'] is not None:
+                            region_data = dataset['regional'].level('REGION')
                         
                         # Initialize article generator
                         article_gen = ArticleGenerator()
                         
-                        # Generate the article
-                        article = article_gen.generate_article(
+                        # Generate the article, reusing an identical earlier render
+                        article = get_article_cache().get_or_generate(
+                            article_gen,
                             selected_keyword,
                             related_topics_data,
                             related_queries_data,
                             tone=article_tone.lower(),
-                            length=word_count
+                            length=word_count,
+                            seed=article_seed,
+                            region_data=region_data
                         )
                         
+                        # Flag articles that read almost the same as earlier ones
+                        duplicates = st.session_state.article_dedup.add(article_key, article, selected_keyword)
+                        
                         # Store in session state
-                        st.session_state.articles[selected_keyword] = article
+                        st.session_state.articles.put(article_key, {'article': article, 'duplicates': duplicates})
             
             with col2:
                 # Display the generated article if available
-                if selected_keyword in st.session_state.articles:
-                    article = st.session_state.articles[selected_keyword]
+                entry = st.session_state.articles.get(article_key)
+                if entry is not None:
+                    article = entry['article']
                     
                     # Article display
                     st.subheader(f"Article about {selected_keyword}")
+                    
+                    duplicates = [d for d in entry['duplicates'] if d[0] in st.session_state.articles]
+                    if duplicates:
+                        (dup_keyword, dup_tone, _, dup_seed), similarity = duplicates[0]
+                        st.warning(
+                            f"This article is {similarity:.0%} similar to the {dup_tone} article about "
+                            f"'{dup_keyword}' (seed {dup_seed}). Try a different seed or tone."
+                        )
+                    
                     st.markdown(article)
                     
                     # Download button for article
@@ -241,6 +428,91 @@ def main():
                     )
                 else:
                     st.info("No article generated yet. Click 'Generate Article' to create one.")
+        
+        elif view == "Keyword Discovery":
+            st.header("Keyword Discovery")
+            topic_index = get_topic_index()
+            # Pick up scrapes indexed by the HTTP service and workers
+            topic_index.refresh()
+            st.caption(f"{len(topic_index)} topics and queries indexed across {len(topic_index.keywords)} keywords.")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Reverse lookup: which tracked keywords surface a term
+                term = st.text_input("Topic or query")
+                if term:
+                    hits = topic_index.keywords_for(term)
+                    if hits:
+                        st.dataframe(pd.DataFrame(hits), use_container_width=True)
+                    else:
+                        st.info(f"No tracked keyword surfaces '{term}'.")
+            
+            with col2:
+                # Expansion: related terms within two hops of a seed keyword
+                seed = st.text_input("Seed keyword")
+                if seed:
+                    expansion = topic_index.expand(seed, hops=2)
+                    if expansion:
+                        st.dataframe(
+                            pd.DataFrame(expansion, columns=["term", "score", "hops"]),
+                            use_container_width=True
+                        )
+                    else:
+                        st.info(f"'{seed}' has not been indexed yet.")
+        
+        elif view == "Compare Snapshots":
+            st.header("Compare Snapshots")
+            
+            # Only snapshots of the current search are offered, newest first
+            snapshots = get_snapshot_store().list(
+                keywords=dataset['keywords'], timeframe=dataset['timeframe'], geo=dataset['geo']
+            )
+            if len(snapshots) < 2:
+                st.info("Fetch these keywords again later to compare snapshots.")
+            else:
+                # Numbered, so snapshots taken within the same second still get distinct labels
+                labels = {
+                    meta['id']: f"#{len(snapshots) - i}: {meta['taken_at'].replace('T', ' ')}"
+                    for i, meta in enumerate(snapshots)
+                }
+                ids = list(labels)
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    old_id = st.selectbox("Before", ids, index=1, format_func=labels.get, key="snapshot_old")
+                with col2:
+                    new_id = st.selectbox("After", ids, index=0, format_func=labels.get, key="snapshot_new")
+                
+                if old_id == new_id:
+                    st.info("Select two different snapshots.")
+                else:
+                    diff = diff_snapshots(old_id, new_id)
+                    
+                    st.subheader("Interest")
+                    st.plotly_chart(
+                        memoized_figure(("snapshot_interest", old_id, new_id), diff.interest_chart),
+                        use_container_width=True
+                    )
+                    st.dataframe(diff.interest, use_container_width=True)
+                    
+                    st.subheader("Related Topics and Queries")
+                    failed = list(dict.fromkeys(diff.old.related.failed_keywords + diff.new.related.failed_keywords))
+                    if failed:
+                        st.caption(f"Related data failed to fetch for {', '.join(failed)} in one of the snapshots; it is left out of the comparison.")
+                    st.plotly_chart(
+                        memoized_figure(("snapshot_related", old_id, new_id), diff.related_chart),
+                        use_container_width=True
+                    )
+                    
+                    for label, rows in (
+                        ("New entrants", diff.new_entrants),
+                        ("Dropped", diff.dropped),
+                        ("Rank moves", diff.rank_moves)
+                    ):
+                        st.write(f"{label} ({len(rows)})")
+                        if not rows.empty:
+                            st.dataframe(rows, hide_index=True, use_container_width=True)
 
 if __name__ == "__main__":
     main()
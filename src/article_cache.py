@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.path.join("data", "article_cache")
+
+
+def hash_related_data(*datasets):
+    """
+    Compute a stable content hash of related topics/queries data.
+
+    Args:
+        *datasets: Related data as returned per keyword by TrendsScraper
+            (dicts of DataFrames), or DataFrames such as RelatedStore views
+
+    Returns:
+        str: Hex digest that changes whenever any of the data changes
+    """
+    digest = hashlib.sha256()
+
+    def update(value):
+        if value is None:
+            digest.update(b'none')
+        elif isinstance(value, pd.DataFrame):
+            # Re-scraping identical data shouldn't invalidate cached articles
+            value = value.drop(columns=['fetched_at'], errors='ignore')
+            digest.update(json.dumps([str(c) for c in value.columns]).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(value, index=False).values.tobytes())
+        elif isinstance(value, dict):
+            for key in sorted(value, key=str):
+                digest.update(f"<{key}>".encode('utf-8'))
+                update(value[key])
+        else:
+            digest.update(repr(value).encode('utf-8'))
+        digest.update(b'|')
+
+    for data in datasets:
+        update(data)
+
+    return digest.hexdigest()
+
+
+class ArticleCache:
+    """Content-addressed LRU cache of generated articles, persisted to disk."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=500):
+        """
+        Initialize the cache, picking up any articles already on disk.
+
+        Args:
+            cache_dir (str): Directory articles are stored in (None to keep them in memory only)
+            max_entries (int): Maximum number of articles kept before the least recently used is evicted
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._load_existing()
+
+    def _load_existing(self):
+        """Index articles persisted by earlier runs, oldest access first."""
+        paths = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".md"):
+                path = os.path.join(self.cache_dir, name)
+                paths.append((os.path.getmtime(path), name[:-3]))
+
+        for _, key in sorted(paths):
+            # Content is read lazily on first access
+            self._entries[key] = None
+        self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.md")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @staticmethod
+    def make_key(keyword, tone, length, related_hash, seed, template_version):
+        """
+        Build the content address of an article.
+
+        Args:
+            keyword (str): The main keyword for the article
+            tone (str): Article tone
+            length (str): Article length
+            related_hash (str): Hash of the related data from hash_related_data
+            seed (int): Generation seed
+            template_version (str): ArticleGenerator.template_version
+
+        Returns:
+            str: Hex digest identifying the article
+        """
+        payload = json.dumps([keyword, tone, length, related_hash, seed, template_version])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Look up an article, marking it as recently used.
+
+        Args:
+            key (str): Key from make_key
+
+        Returns:
+            str: The cached article, or None on a miss
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            article = self._entries[key]
+            if article is None:
+                try:
+                    with open(self._path(key), encoding='utf-8') as f:
+                        article = f.read()
+                    os.utime(self._path(key))
+                except OSError:
+                    del self._entries[key]
+                    self.misses += 1
+                    return None
+                self._entries[key] = article
+            elif self.cache_dir is not None:
+                try:
+                    os.utime(self._path(key))
+                except OSError:
+                    pass
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return article
+
+    def put(self, key, article):
+        """
+        Store an article, evicting the least recently used ones if the cache is full.
+
+        Args:
+            key (str): Key from make_key
+            article (str): Generated article
+        """
+        with self._lock:
+            if self.cache_dir is not None:
+                # Unique temporary file, since the app, service and workers can share the directory
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=key, suffix=".tmp")
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        f.write(article)
+                    os.replace(tmp_path, self._path(key))
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
+
+            self._entries[key] = article
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            if self.cache_dir is not None:
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+
+    def get_or_generate(self, generator, keyword, related_topics_data, related_queries_data,
+                        tone="informative", length="medium", seed=None, published_on=None,
+                        region_data=None):
+        """
+        Return a cached article or render and cache a new one.
+
+        Unseeded requests are not reproducible, so they are always rendered and
+        never cached. Articles are cached undated and dated with published_on
+        when served, so a cache hit never shows the date of its first render.
+
+        Args:
+            generator (ArticleGenerator): Generator used on a cache miss
+            keyword (str): The main keyword for the article
+            related_topics_data (dict): Related topics data for the keyword
+            related_queries_data (dict): Related queries data for the keyword
+            tone (str): Article tone
+            length (str): Article length
+            seed (int): Generation seed
+            published_on (datetime.date): Publication date shown in the article (defaults to today)
+            region_data (pandas.DataFrame): State-level interest passed to the generator
+
+        Returns:
+            str: Generated article
+        """
+        if seed is None:
+            return generator.generate_article(
+                keyword, related_topics_data, related_queries_data,
+                tone=tone, length=length, published_on=published_on, region_data=region_data
+            )
+
+        if tone not in generator.templates:
+            tone = "informative"
+
+        key = self.make_key(
+            keyword, tone, length,
+            hash_related_data(related_topics_data, related_queries_data, region_data),
+            seed, generator.template_version
+        )
+        article = self.get(key)
+        if article is None:
+            article = generator.generate_undated_article(
+                keyword, related_topics_data, related_queries_data,
+                tone=tone, length=length, seed=seed, region_data=region_data
+            )
+            self.put(key, article)
+
+        return generator.date_article(article, published_on)
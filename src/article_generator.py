@@ -1,7 +1,12 @@
 import pandas as pd
+import hashlib
+import json
 import random
 from datetime import datetime
 
+# Stands in for the publication date in undated articles, see ArticleGenerator.date_article
+DATE_PLACEHOLDER = "{published_on}"
+
 class ArticleGenerator:
     """Class for generating articles based on Google Trends data."""
     
@@ -37,7 +42,7 @@ class ArticleGenerator:
                     "Examining the trend coefficient for {keyword}, we observe a {trend_direction} with a notable correlation to {related_topic1}. This statistical relationship suggests {insight}.",
                     "When performing comparative analysis between {keyword} and adjacent search terms like {related_query1}, we detect a pattern that indicates {pattern_insight}.",
                     "The temporal distribution of search interest demonstrates cyclical patterns with peaks occurring around {peak_insight}. This periodicity may be attributed to {reason}.",
-                    "Regional variance analysis shows a standard deviation of interest across different geographical areas, with particular concentration in {geo_insight}.",
+                    "Regional variance analysis shows a standard deviation of interest across different geographical areas, with particular concentration in {geo_places}.",
                     "Correlation coefficients between {keyword} and {related_topic2} suggest a causal relationship that merits further investigation, particularly regarding {specific_aspect}."
                 ],
                 'conclusion': [
@@ -57,7 +62,7 @@ class ArticleGenerator:
                     "Consider how {related_topic1} connects with {keyword}. This relationship highlights an unmistakable pattern that savvy observers are already leveraging to their advantage.",
                     "When people search for {related_query1}, they're expressing a genuine need. The {query_trend} in these searches demonstrates the growing importance of addressing this topic.",
                     "Leaders in this space are already capitalizing on the growing interest in {keyword}. Those who hesitate to acknowledge this trend risk being left behind as the landscape evolves.",
-                    "The regional data is particularly telling—{geo_insight} shows that this isn't just a localized phenomenon but a widespread movement gaining momentum across diverse areas."
+                    "The regional data is particularly telling—strong interest in {geo_places} shows that this isn't just a localized phenomenon but a widespread movement gaining momentum across diverse areas."
                 ],
                 'conclusion': [
                     "The time to act on these {keyword} trends is now. As interest continues to grow, early adopters will secure the advantages that come with foresight and decisive action.",
@@ -75,7 +80,7 @@ class ArticleGenerator:
                     "The trend line for {keyword} is going {trend_direction} faster than my motivation on a Monday morning. This sudden fame might be because {humorous_reason}.",
                     "People are also searching for {related_query1}, which is like the quirky sidekick to our main character {keyword}. They go together like awkward small talk and elevator rides.",
                     "Interestingly, {related_topic1} is riding on the coattails of {keyword}'s newfound popularity. It's the classic 'I knew them before they were famous' situation.",
-                    "The geographical data shows that folks in {geo_insight} are particularly obsessed. Perhaps they have less exciting things to Google? No judgment here!",
+                    "The geographical data shows that folks in {geo_places} are particularly obsessed. Perhaps they have less exciting things to Google? No judgment here!",
                     "If {keyword} were a celebrity, its publicist would be popping champagne right now. Its rise to fame has been more dramatic than the plot twists in my favorite binge-worthy shows."
                 ],
                 'conclusion': [
@@ -95,7 +100,7 @@ class ArticleGenerator:
                     "What's really caught my attention is how {related_topic1} ties into all this. It's like when you start thinking about one thing, and it naturally leads you to another connected idea.",
                     "People are also asking about {related_query1} a lot more. Does that surprise you? I find it makes sense because when you're exploring {keyword}, that question naturally comes up.",
                     "Between you and me, I think the reason we're seeing this trend might be {reason}. What do you think? Does that resonate with your experience?",
-                    "It's fascinating to see that people in {geo_insight} are particularly interested in this topic. I wonder if that's because of {regional_reason} or if it's just coincidence."
+                    "It's fascinating to see that people in {geo_places} are particularly interested in this topic. I wonder if that's because of {regional_reason} or if it's just coincidence."
                 ],
                 'conclusion': [
                     "At the end of the day, whether {keyword} is just having a moment or becoming a lasting part of our conversations, it's always interesting to see what captures our collective attention, isn't it?",
@@ -104,149 +109,272 @@ class ArticleGenerator:
                 ]
             }
         }
-    
-    def generate_article(self, keyword, related_topics_data, related_queries_data, tone="informative", length="medium"):
-        """
-        Generate an article based on trends data.
-        
-        Args:
-            keyword (str): The main keyword for the article
-            related_topics_data (dict): Dictionary containing related topics data
-            related_queries_data (dict): Dictionary containing related queries data
-            tone (str): Tone of the article (informative, analytical, persuasive, entertaining, conversational)
-            length (str): Length of the article (short, medium, long)
-            
-        Returns:
-            str: Generated article
-        """
-        # Default to informative if tone not found
-        if tone not in self.templates:
-            tone = "informative"
-        
-        # Select template
-        template = self.templates[tone]
-        
-        # Extract related topics if available
-        related_topics = []
-        if 'top' in related_topics_data and related_topics_data['top'] is not None:
-            related_topics = related_topics_data['top']['topic_title'].tolist() if 'topic_title' in related_topics_data['top'].columns else []
-        elif 'rising' in related_topics_data and related_topics_data['rising'] is not None:
-            related_topics = related_topics_data['rising']['topic_title'].tolist() if 'topic_title' in related_topics_data['rising'].columns else []
-        
-        # Extract related queries if available
-        related_queries = []
-        if 'top' in related_queries_data and related_queries_data['top'] is not None:
-            related_queries = related_queries_data['top']['query'].tolist() if 'query' in related_queries_data['top'].columns else []
-        elif 'rising' in related_queries_data and related_queries_data['rising'] is not None:
-            related_queries = related_queries_data['rising']['query'].tolist() if 'query' in related_queries_data['rising'].columns else []
         
-        # Create placeholders
-        replacements = {
-            'keyword': keyword,
-            'trend_direction': random.choice(['increasing', 'rising', 'growing', 'surging', 'climbing']),
-            'timeframe': random.choice(['the past week', 'recent months', 'the last quarter', 'this year']),
-            'insight': random.choice([
-                'there is growing public interest in this area', 
-                'this topic is becoming increasingly relevant in today\'s context', 
+        # Interchangeable phrases for the placeholders, picked with the article's seed
+        self.phrases = {
+            'trend_direction': [
+                'increasing',
+                'rising',
+                'growing',
+                'surging',
+                'climbing'
+            ],
+            'timeframe': [
+                'the past week',
+                'recent months',
+                'the last quarter',
+                'this year'
+            ],
+            'insight': [
+                'there is growing public interest in this area',
+                "this topic is becoming increasingly relevant in today's context",
                 'more people are seeking information on this subject',
                 'this represents a shift in public awareness and curiosity'
-            ]),
-            'related_topic1': related_topics[0] if related_topics else 'related subjects',
-            'related_topic2': related_topics[1] if len(related_topics) > 1 else 'similar topics',
-            'related_query1': related_queries[0] if related_queries else 'common questions',
-            'query_trend': random.choice(['increased', 'grown', 'expanded', 'risen']),
-            'reason': random.choice([
-                'recent developments in the field', 
-                'increased media coverage', 
+            ],
+            'query_trend': [
+                'increased',
+                'grown',
+                'expanded',
+                'risen'
+            ],
+            'reason': [
+                'recent developments in the field',
+                'increased media coverage',
                 'growing awareness of its importance',
                 'changing consumer preferences',
                 'technological advancements'
-            ]),
-            'geo_insight': random.choice([
-                'certain regions show notably higher interest', 
-                'interest varies significantly by location', 
+            ],
+            'geo_insight': [
+                'certain regions show notably higher interest',
+                'interest varies significantly by location',
                 'some areas show disproportionately high engagement',
                 'interest is concentrated in specific geographical areas'
-            ]),
-            'broader_category': random.choice([
-                'this industry', 
-                'this field', 
+            ],
+            'geo_places': [
+                'certain regions',
+                'a handful of states',
+                'some parts of the country',
+                'specific geographical areas'
+            ],
+            'broader_category': [
+                'this industry',
+                'this field',
                 'related sectors',
                 'the market',
                 'consumer behavior'
-            ]),
-            'humorous_reason': random.choice([
-                'everyone suddenly decided to become an expert overnight', 
-                'it\'s the internet\'s new obsession',
+            ],
+            'humorous_reason': [
+                'everyone suddenly decided to become an expert overnight',
+                "it's the internet's new obsession",
                 'we all collectively decided it was worth our attention',
-                'it\'s more entertaining than watching paint dry'
-            ]),
-            'conversational_insight': random.choice([
-                'people are genuinely curious to learn more about it', 
+                "it's more entertaining than watching paint dry"
+            ],
+            'conversational_insight': [
+                'people are genuinely curious to learn more about it',
                 'it touches on something many of us are experiencing right now',
                 'it addresses a common challenge or opportunity',
                 'it connects to broader changes happening in our society'
-            ]),
-            'pattern_insight': random.choice([
-                'a growing ecosystem of related interests', 
+            ],
+            'pattern_insight': [
+                'a growing ecosystem of related interests',
                 'shifting priorities among searchers',
                 'an evolution in how people think about this topic',
                 'emerging connections between previously separate domains'
-            ]),
-            'peak_insight': random.choice([
-                'specific events or announcements', 
+            ],
+            'peak_insight': [
+                'specific events or announcements',
                 'seasonal factors',
                 'cyclical industry developments',
                 'media coverage spikes'
-            ]),
-            'specific_aspect': random.choice([
-                'user adoption patterns', 
+            ],
+            'specific_aspect': [
+                'user adoption patterns',
                 'market development stages',
                 'information-seeking behaviors',
                 'public perception shifts'
-            ]),
-            'regional_reason': random.choice([
-                'local policies or initiatives', 
+            ],
+            'regional_reason': [
+                'local policies or initiatives',
                 'cultural factors',
                 'regional economic conditions',
                 'community interests'
-            ])
+            ]
+        }
+    
+    @property
+    def template_version(self):
+        """Short content hash of the templates and phrases, used to invalidate cached articles."""
+        payload = json.dumps([self.templates, self.phrases], sort_keys=True).encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()[:12]
+    
+    @staticmethod
+    def _related_texts(related_data, column):
+        """
+        List related topic titles or queries, preferring top entries over rising ones.
+        
+        Args:
+            related_data: Either a RelatedStore view (long-format DataFrame with
+                'kind' and 'text' columns) or a pytrends-style dict of 'top'/'rising' DataFrames
+            column (str): Column holding the text in pytrends-style DataFrames
+            
+        Returns:
+            list: Topic titles or queries
+        """
+        if isinstance(related_data, pd.DataFrame):
+            for kind in ('top', 'rising'):
+                texts = related_data.loc[related_data['kind'] == kind, 'text']
+                if not texts.empty:
+                    return texts.astype(str).tolist()
+            return []
+        
+        related_data = related_data or {}
+        for kind in ('top', 'rising'):
+            df = related_data.get(kind)
+            if df is not None:
+                return df[column].tolist() if column in df.columns else []
+        return []
+    
+    @staticmethod
+    def _format_places(regions):
+        """Join region names into a phrase such as "California, Texas and Ohio"."""
+        if len(regions) == 1:
+            return regions[0]
+        return ", ".join(regions[:-1]) + f" and {regions[-1]}"
+    
+    def generate_article(self, keyword, related_topics_data, related_queries_data, tone="informative", length="medium", seed=None, published_on=None, region_data=None):
+        """
+        Generate an article based on trends data.
+        
+        Args:
+            keyword (str): The main keyword for the article
+            related_topics_data: Related topics, as a RelatedStore view or a dict of DataFrames
+            related_queries_data: Related queries, as a RelatedStore view or a dict of DataFrames
+            tone (str): Tone of the article (informative, analytical, persuasive, entertaining, conversational)
+            length (str): Length of the article (short, medium, long)
+            seed (int): Seed for template selection; the same seed and inputs always give the same article
+            published_on (datetime.date): Publication date shown in the article (defaults to today)
+            region_data (pandas.DataFrame): State-level interest by region; when it has a column
+                for the keyword, the regional insight names the states with the highest interest
+            
+        Returns:
+            str: Generated article
+        """
+        article = self.generate_undated_article(
+            keyword, related_topics_data, related_queries_data,
+            tone=tone, length=length, seed=seed, region_data=region_data
+        )
+        return self.date_article(article, published_on)
+    
+    @staticmethod
+    def date_article(article, published_on=None):
+        """
+        Fill in the publication date of an article from generate_undated_article.
+        
+        Args:
+            article (str): Undated article
+            published_on (datetime.date): Publication date (defaults to today)
+            
+        Returns:
+            str: Article with its publication date
+        """
+        current_date = (published_on or datetime.now()).strftime("%B %d, %Y")
+        return article.replace(f"*Published on {DATE_PLACEHOLDER}*", f"*Published on {current_date}*", 1)
+    
+    def generate_undated_article(self, keyword, related_topics_data, related_queries_data, tone="informative", length="medium", seed=None, region_data=None):
+        """
+        Generate an article with a placeholder for its publication date.
+        
+        Undated articles can be cached and dated when they are served.
+        
+        Args:
+            keyword (str): The main keyword for the article
+            related_topics_data: Related topics, as a RelatedStore view or a dict of DataFrames
+            related_queries_data: Related queries, as a RelatedStore view or a dict of DataFrames
+            tone (str): Tone of the article (informative, analytical, persuasive, entertaining, conversational)
+            length (str): Length of the article (short, medium, long)
+            seed (int): Seed for template selection; the same seed and inputs always give the same article
+            region_data (pandas.DataFrame): State-level interest by region; when it has a column
+                for the keyword, the regional insight names the states with the highest interest
+            
+        Returns:
+            str: Generated article, dated with DATE_PLACEHOLDER
+        """
+        # Default to informative if tone not found
+        if tone not in self.templates:
+            tone = "informative"
+        
+        # Private generator so seeded runs are reproducible and don't touch global state
+        rng = random.Random(seed)
+        
+        # Select template
+        template = self.templates[tone]
+        
+        # Extract related topics and queries if available
+        related_topics = self._related_texts(related_topics_data, 'topic_title')
+        related_queries = self._related_texts(related_queries_data, 'query')
+        
+        # Describe where interest is highest if regional data is available
+        top_regions = []
+        if region_data is not None and keyword in region_data.columns:
+            values = region_data[keyword]
+            top_regions = values[values > 0].nlargest(3).index.tolist()
+        
+        # Create placeholders
+        replacements = {
+            'keyword': keyword,
+            'trend_direction': rng.choice(self.phrases['trend_direction']),
+            'timeframe': rng.choice(self.phrases['timeframe']),
+            'insight': rng.choice(self.phrases['insight']),
+            'related_topic1': related_topics[0] if related_topics else 'related subjects',
+            'related_topic2': related_topics[1] if len(related_topics) > 1 else 'similar topics',
+            'related_query1': related_queries[0] if related_queries else 'common questions',
+            'query_trend': rng.choice(self.phrases['query_trend']),
+            'reason': rng.choice(self.phrases['reason']),
+            'geo_insight': f"interest is highest in {self._format_places(top_regions)}" if top_regions else rng.choice(self.phrases['geo_insight']),
+            # Place names only, for templates that read "in {geo_places}"
+            'geo_places': self._format_places(top_regions) if top_regions else rng.choice(self.phrases['geo_places']),
+            'broader_category': rng.choice(self.phrases['broader_category']),
+            'humorous_reason': rng.choice(self.phrases['humorous_reason']),
+            'conversational_insight': rng.choice(self.phrases['conversational_insight']),
+            'pattern_insight': rng.choice(self.phrases['pattern_insight']),
+            'peak_insight': rng.choice(self.phrases['peak_insight']),
+            'specific_aspect': rng.choice(self.phrases['specific_aspect']),
+            'regional_reason': rng.choice(self.phrases['regional_reason'])
         }
         
         # Generate intro paragraph
-        intro = random.choice(template['intro'])
+        intro = rng.choice(template['intro'])
         for key, value in replacements.items():
             intro = intro.replace(f"{{{key}}}", value)
         
         # Generate body paragraphs based on length
         if length == "short":
-            num_paragraphs = random.randint(2, 3)
+            num_paragraphs = rng.randint(2, 3)
         elif length == "medium":
-            num_paragraphs = random.randint(4, 6)
+            num_paragraphs = rng.randint(4, 6)
         else:  # long
-            num_paragraphs = random.randint(7, 10)
+            num_paragraphs = rng.randint(7, 10)
         
         body_paragraphs = []
         # Ensure we don't exceed the template's body paragraphs
         num_paragraphs = min(num_paragraphs, len(template['body']))
         
         for _ in range(num_paragraphs):
-            paragraph = random.choice(template['body'])
+            paragraph = rng.choice(template['body'])
             for key, value in replacements.items():
                 paragraph = paragraph.replace(f"{{{key}}}", value)
             body_paragraphs.append(paragraph)
         
         # Generate conclusion
-        conclusion = random.choice(template['conclusion'])
+        conclusion = rng.choice(template['conclusion'])
         for key, value in replacements.items():
             conclusion = conclusion.replace(f"{{{key}}}", value)
         
         # Assemble the article
-        current_date = datetime.now().strftime("%B %d, %Y")
         title = f"Trending Insights: Understanding the Rise of {keyword}"
         
         article = f"# {title}\n\n"
-        article += f"*Published on {current_date}*\n\n"
+        article += f"*Published on {DATE_PLACEHOLDER}*\n\n"
         article += f"{intro}\n\n"
         article += "\n\n".join(body_paragraphs) + "\n\n"
         article += f"{conclusion}\n\n"
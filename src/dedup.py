@@ -0,0 +1,367 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from src.work_queue import connect
+
+DEFAULT_DEDUP_PATH = os.path.join("data", "dedup.db")
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes. With a, b
+# and x all below 2**32 the product fits in uint64 without overflow.
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _false_positive_area(threshold, bands, rows, steps=100):
+    """Probability mass of pairs below the threshold that still share a band."""
+    xs = np.linspace(0.0, threshold, steps)
+    return np.mean(1 - (1 - xs ** rows) ** bands) * threshold
+
+
+def _false_negative_area(threshold, bands, rows, steps=100):
+    """Probability mass of pairs above the threshold that share no band."""
+    xs = np.linspace(threshold, 1.0, steps)
+    return np.mean(1 - (1 - (1 - xs ** rows) ** bands)) * (1.0 - threshold)
+
+
+def optimal_bands(threshold, num_perm):
+    """
+    Pick the LSH band layout that best separates pairs around the threshold.
+
+    Args:
+        threshold (float): Jaccard similarity at which articles count as duplicates
+        num_perm (int): Number of MinHash permutations
+
+    Returns:
+        tuple: (bands, rows) with bands * rows <= num_perm
+    """
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        error = (_false_positive_area(threshold, bands, rows)
+                 + _false_negative_area(threshold, bands, rows))
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateDetector:
+    """MinHash/LSH index that flags articles too similar to ones already seen."""
+
+    def __init__(self, threshold=0.8, num_perm=128, shingle_size=5, seed=1):
+        """
+        Initialize an empty detector.
+
+        Args:
+            threshold (float): Estimated Jaccard similarity (0-1) at which articles count as duplicates
+            num_perm (int): Number of MinHash permutations; more is slower but more accurate
+            shingle_size (int): Number of consecutive words per shingle
+            seed (int): Seed for the hash permutations
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._signatures = {}
+        self._buckets = [{} for _ in range(self.bands)]
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, article_id):
+        return article_id in self._signatures
+
+    def shingles(self, text, keyword=None):
+        """
+        Split an article into overlapping word shingles.
+
+        Args:
+            text (str): Article text
+            keyword (str): Article keyword; masked out so articles built from the
+                same templates for different keywords are recognised as duplicates
+
+        Returns:
+            set: Shingle strings
+        """
+        text = text.casefold()
+        if keyword:
+            text = re.sub(r"\b" + re.escape(keyword.casefold()) + r"\b", " kw ", text)
+
+        tokens = _TOKEN_RE.findall(text)
+        if len(tokens) <= self.shingle_size:
+            return {" ".join(tokens)}
+        return {
+            " ".join(tokens[i:i + self.shingle_size])
+            for i in range(len(tokens) - self.shingle_size + 1)
+        }
+
+    def signature(self, text, keyword=None):
+        """
+        Compute the MinHash signature of an article.
+
+        Args:
+            text (str): Article text
+            keyword (str): Article keyword to mask out
+
+        Returns:
+            numpy.ndarray: uint32 signature of length num_perm
+        """
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little')
+             for s in self.shingles(text, keyword)),
+            dtype=np.uint64
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def query(self, text, keyword=None, signature=None):
+        """
+        Find indexed articles similar to the given text.
+
+        Only articles sharing at least one LSH band are compared, so lookups
+        stay fast regardless of how many articles have been indexed.
+
+        Args:
+            text (str): Article text
+            keyword (str): Article keyword to mask out
+            signature (numpy.ndarray): Precomputed signature, if available
+
+        Returns:
+            list: (article_id, estimated_similarity) tuples at or above the threshold, most similar first
+        """
+        if signature is None:
+            signature = self.signature(text, keyword)
+
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        duplicates = []
+        for article_id in candidates:
+            similarity = float(np.mean(self._signatures[article_id] == signature))
+            if similarity >= self.threshold:
+                duplicates.append((article_id, similarity))
+
+        duplicates.sort(key=lambda d: d[1], reverse=True)
+        return duplicates
+
+    def add(self, article_id, text, keyword=None):
+        """
+        Check an article against the index and then add it.
+
+        Args:
+            article_id: Hashable identifier for the article
+            text (str): Article text
+            keyword (str): Article keyword to mask out
+
+        Returns:
+            list: Near-duplicates of the article that were already indexed (see query)
+        """
+        signature = self.signature(text, keyword)
+        duplicates = [d for d in self.query(text, signature=signature) if d[0] != article_id]
+        self._index(article_id, signature)
+        return duplicates
+
+    def _index(self, article_id, signature):
+        if article_id in self._signatures:
+            return
+        self._signatures[article_id] = signature
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(article_id)
+
+    def remove(self, article_id):
+        """
+        Drop an article from the index.
+
+        Args:
+            article_id: Identifier the article was added under
+
+        Returns:
+            bool: False if the article was not indexed
+        """
+        signature = self._signatures.pop(article_id, None)
+        if signature is None:
+            return False
+
+        for band, key in self._band_keys(signature):
+            bucket = self._buckets[band].get(key, [])
+            if article_id in bucket:
+                bucket.remove(article_id)
+            if not bucket:
+                self._buckets[band].pop(key, None)
+        return True
+
+
+
+def _decode_id(value):
+    """JSON article id back to a hashable value; lists were tuples before encoding."""
+    article_id = json.loads(value)
+    return tuple(article_id) if isinstance(article_id, list) else article_id
+
+
+class SharedDuplicateDetector(NearDuplicateDetector):
+    """Detector whose index is stored in SQLite, so every worker and service
+    process on a host checks against the same articles and the index survives
+    restarts.
+
+    Each process keeps an in-memory copy of the index and reads only the rows
+    added by other processes since its last lookup. Article ids must be
+    JSON-serializable (tuples come back as tuples).
+    """
+
+    def __init__(self, path=DEFAULT_DEDUP_PATH, threshold=0.8, num_perm=128, shingle_size=5, seed=1):
+        """
+        Open (and if needed create) the shared index.
+
+        Args:
+            path (str): Database file every participant points at (can be the work queue's)
+            threshold (float): Estimated Jaccard similarity (0-1) at which articles count as duplicates
+            num_perm (int): Number of MinHash permutations
+            shingle_size (int): Number of consecutive words per shingle
+            seed (int): Seed for the hash permutations
+        """
+        super().__init__(threshold, num_perm, shingle_size, seed)
+        self.conn = connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS article_signatures ("
+            " article_id TEXT PRIMARY KEY, keyword TEXT, signature BLOB NOT NULL, added_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS dedup_params (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+        # Signatures are only comparable between detectors hashing the same way
+        params = json.dumps([num_perm, shingle_size, seed])
+        self.conn.execute("INSERT OR IGNORE INTO dedup_params (name, value) VALUES ('minhash', ?)", (params,))
+        stored = self.conn.execute("SELECT value FROM dedup_params WHERE name = 'minhash'").fetchone()[0]
+        if stored != params:
+            raise ValueError(f"{path} holds signatures made with different parameters (num_perm, shingle_size, seed = {stored})")
+
+        self._last_rowid = 0
+        self._lock = threading.RLock()
+        self.sync()
+
+    def sync(self):
+        """
+        Load articles added by other processes since the last sync.
+
+        Returns:
+            int: Number of articles loaded
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT rowid, article_id, signature FROM article_signatures WHERE rowid > ? ORDER BY rowid",
+                (self._last_rowid,)
+            ).fetchall()
+            for rowid, article_id, signature in rows:
+                self._index(_decode_id(article_id), np.frombuffer(signature, dtype=np.uint32))
+                self._last_rowid = rowid
+        return len(rows)
+
+    def query(self, text, keyword=None, signature=None):
+        with self._lock:
+            self.sync()
+            return super().query(text, keyword, signature)
+
+    def add(self, article_id, text, keyword=None):
+        with self._lock:
+            signature = self.signature(text, keyword)
+            duplicates = [d for d in self.query(text, signature=signature) if d[0] != article_id]
+            self.conn.execute(
+                "INSERT OR IGNORE INTO article_signatures (article_id, keyword, signature, added_at) VALUES (?, ?, ?, ?)",
+                (json.dumps(article_id), keyword, signature.tobytes(), time.time())
+            )
+            self._index(article_id, signature)
+        return duplicates
+
+    def remove(self, article_id):
+        # Other processes keep their in-memory copy until they restart
+        with self._lock:
+            self.conn.execute("DELETE FROM article_signatures WHERE article_id = ?", (json.dumps(article_id),))
+            return super().remove(article_id)
+
+
+def _attempt_id(keyword, tone, seed, article):
+    """Default id for an article: (keyword, tone, seed), or a digest of the text for unseeded articles."""
+    if seed is None:
+        return (keyword, tone, hashlib.sha256(article.encode('utf-8')).hexdigest()[:16])
+    return (keyword, tone, seed)
+
+
+def generate_distinct_article(generator, detector, keyword, related_topics_data, related_queries_data,
+                              tone="informative", length="medium", seed=0, max_attempts=5,
+                              alternate_tones=(), cache=None, article_id=None):
+    """
+    Generate an article, regenerating it while it collides with earlier ones.
+
+    The requested tone is retried with seeds seed, seed + 1, ... and then each
+    alternate tone is tried with the original seed. If every attempt collides,
+    the least similar one is kept and returned with its duplicates so the
+    caller can flag it.
+
+    Args:
+        generator (ArticleGenerator): Generator used to render articles
+        detector (NearDuplicateDetector): Index of articles already produced
+        keyword (str): The main keyword for the article
+        related_topics_data (dict): Related topics data for the keyword
+        related_queries_data (dict): Related queries data for the keyword
+        tone (str): Preferred article tone
+        length (str): Article length
+        seed (int): First seed to try (None for unseeded attempts)
+        max_attempts (int): Number of seeds to try with the preferred tone
+        alternate_tones (iterable): Tones to fall back to after the seeds run out
+        cache (ArticleCache): Optional cache to render through
+        article_id: Identifier to index the accepted article under (defaults to (keyword, tone, seed),
+            with a digest of the article in place of the seed for unseeded articles)
+
+    Returns:
+        tuple: (article, tone, seed, duplicates); duplicates is empty when the article is distinct
+    """
+    if seed is None:
+        attempts = [(tone, None)] * max_attempts
+    else:
+        attempts = [(tone, seed + i) for i in range(max_attempts)]
+    attempts += [(alt, seed) for alt in alternate_tones if alt != tone]
+
+    best = None
+    for attempt_tone, attempt_seed in attempts:
+        if cache is not None:
+            article = cache.get_or_generate(
+                generator, keyword, related_topics_data, related_queries_data,
+                tone=attempt_tone, length=length, seed=attempt_seed
+            )
+        else:
+            article = generator.generate_article(
+                keyword, related_topics_data, related_queries_data,
+                tone=attempt_tone, length=length, seed=attempt_seed
+            )
+
+        # An article already indexed under this attempt's own id is a repeat request, not a collision
+        attempt_id = article_id if article_id is not None else _attempt_id(keyword, attempt_tone, attempt_seed, article)
+        signature = detector.signature(article, keyword)
+        duplicates = [d for d in detector.query(article, signature=signature) if d[0] != attempt_id]
+        score = duplicates[0][1] if duplicates else 0.0
+        if best is None or score < best[0]:
+            best = (score, article, attempt_tone, attempt_seed)
+        if not duplicates:
+            break
+
+    _, article, chosen_tone, chosen_seed = best
+    if article_id is None:
+        article_id = _attempt_id(keyword, chosen_tone, chosen_seed, article)
+    duplicates = detector.add(article_id, article, keyword)
+    return article, chosen_tone, chosen_seed, duplicates
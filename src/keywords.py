@@ -0,0 +1,82 @@
+def normalize_keyword(keyword):
+    """
+    Canonical form of a keyword: lower-cased with whitespace collapsed.
+
+    Google Trends treats keywords case-insensitively, so keywords that only
+    differ in case or spacing are the same request. The canonical form is
+    sent to Google, so it uses lower() rather than casefold(): casefold()
+    rewrites letters such as "ß" to "ss" and would merge distinct terms.
+
+    Args:
+        keyword (str): Raw keyword
+
+    Returns:
+        str: Canonical keyword ('' for blank input)
+    """
+    return " ".join(str(keyword).split()).lower()
+
+
+def parse_keywords(keywords):
+    """
+    Parse user-supplied keywords into a clean, deduplicated list.
+
+    Blank entries (e.g. from a trailing comma) are dropped and repeated
+    keywords are kept once, using the spelling of their first occurrence.
+
+    Args:
+        keywords (str or list): Comma-separated string or list of keywords
+
+    Returns:
+        list: Keywords in their original order and spelling, whitespace tidied
+    """
+    if keywords is None:
+        return []
+    if isinstance(keywords, str):
+        keywords = keywords.split(',')
+
+    parsed = []
+    seen = set()
+    for keyword in keywords:
+        label = " ".join(str(keyword).split())
+        canonical = label.lower()
+        if canonical and canonical not in seen:
+            seen.add(canonical)
+            parsed.append(label)
+    return parsed
+
+
+def keywords_key(keywords):
+    """
+    Order- and case-independent identity of a set of keywords, for cache keys.
+
+    Args:
+        keywords (str or list): Comma-separated string or list of keywords
+
+    Returns:
+        tuple: Sorted canonical keywords; "AI, ml" and "ml,ai" give the same key
+    """
+    return tuple(sorted({normalize_keyword(k) for k in parse_keywords(keywords)}))
+
+
+def remap_columns(df, labels):
+    """
+    Rename canonical keyword columns back to the caller's spelling and order.
+
+    Multi-keyword requests are sent to Google with canonical keywords so any
+    permutation or casing of the same keywords produces the same request;
+    this restores the labels the caller asked for.
+
+    Args:
+        df (pandas.DataFrame): Result with canonical keyword columns
+        labels (list): Keywords as the caller spelled them, in the caller's order
+
+    Returns:
+        pandas.DataFrame: Result with one column per label, other columns left in place
+    """
+    mapping = {normalize_keyword(label): label for label in labels}
+    renamed = df.rename(columns=mapping)
+
+    keyword_columns = [label for label in labels if label in renamed.columns]
+    ordered = iter(keyword_columns)
+    placed = set(keyword_columns)
+    return renamed[[next(ordered) if c in placed else c for c in renamed.columns]]
@@ -0,0 +1,139 @@
+import threading
+import time
+
+from src.work_queue import connect
+
+
+def _check_limits(rate, burst):
+    # A zero rate never refills (and divides by zero), and a bucket smaller than one token never fills
+    if not rate > 0:
+        raise ValueError(f"rate must be positive, got {rate}")
+    if not burst >= 1:
+        raise ValueError(f"burst must be at least 1, got {burst}")
+
+
+class RequestBudget:
+    """Thread-safe token bucket limiting how often Google Trends is called."""
+
+    def __init__(self, rate=0.5, burst=3):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate (float): Tokens added per second (sustained requests per second)
+            burst (int): Maximum number of tokens that can be saved up
+        """
+        _check_limits(rate, burst)
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Take tokens if they are available right now.
+
+        Args:
+            tokens (int): Number of tokens to take
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds to wait before retrying
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Block until tokens are available and take them.
+
+        Args:
+            tokens (int): Number of tokens to take
+            timeout (float): Maximum seconds to wait (None to wait indefinitely)
+
+        Returns:
+            bool: True if the tokens were taken, False if the timeout expired
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class SharedRequestBudget(RequestBudget):
+    """Token bucket stored in SQLite so that several processes on one host share one request budget."""
+
+    def __init__(self, path, name="trends", rate=0.5, burst=3):
+        """
+        Open (and if needed create) the shared bucket.
+
+        Args:
+            path (str): Database file every participant points at (can be the work queue's)
+            name (str): Name of the budget, so one database can hold several
+            rate (float): Tokens added per second across all participants
+            burst (int): Maximum number of tokens that can be saved up
+        """
+        _check_limits(rate, burst)
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.conn = connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS budgets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "INSERT OR IGNORE INTO budgets (name, tokens, updated_at) VALUES (?, ?, ?)",
+            (name, float(burst), time.time())
+        )
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens=1):
+        """
+        Take tokens if they are available right now.
+
+        Args:
+            tokens (int): Number of tokens to take
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds to wait before retrying
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                available, updated = self.conn.execute(
+                    "SELECT tokens, updated_at FROM budgets WHERE name = ?", (self.name,)
+                ).fetchone()
+                # Wall-clock time, since the bucket is shared between processes
+                now = time.time()
+                available = min(self.burst, available + max(0.0, now - updated) * self.rate)
+
+                wait = 0.0
+                if available >= tokens:
+                    available -= tokens
+                else:
+                    wait = (tokens - available) / self.rate
+
+                self.conn.execute(
+                    "UPDATE budgets SET tokens = ?, updated_at = ? WHERE name = ?",
+                    (available, now, self.name)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return wait
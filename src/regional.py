@@ -0,0 +1,200 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from src.keywords import keywords_key, parse_keywords, remap_columns
+from src.trends_scraper import ThreadScrapers
+
+LEVELS = ('REGION', 'DMA', 'CITY')
+
+US_STATES = (
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN',
+    'IA', 'KS', 'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH',
+    'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT',
+    'VT', 'VA', 'WA', 'WV', 'WI', 'WY'
+)
+
+# DMA names end with the state(s) they cover, e.g. "Boston MA-Manchester NH"
+# or "Washington DC (Hagerstown MD)". The first state listed is the home market.
+_DMA_STATE_PATTERN = r"\b(" + "|".join(US_STATES) + r")\b"
+
+
+def dma_states(dma_names):
+    """
+    Map DMA names to the region code of their home state.
+
+    Args:
+        dma_names (pandas.Index): DMA names as returned by Google Trends
+
+    Returns:
+        pandas.Series: Region codes such as 'US-MA' (NaN where no state could be found)
+    """
+    states = pd.Series(dma_names, index=dma_names).str.extract(_DMA_STATE_PATTERN, expand=False)
+    return "US-" + states
+
+
+class RegionalData:
+    """Interest by region at several resolutions, with precomputed roll-ups between them."""
+
+    def __init__(self, keywords, frames):
+        """
+        Initialize from per-resolution frames and precompute roll-ups.
+
+        Args:
+            keywords (list): Keywords the frames hold interest for
+            frames (dict): Resolution -> DataFrame from TrendsScraper.get_interest_by_region
+                (fetched with inc_geo_code=True)
+        """
+        self.keywords = list(keywords)
+        self.frames = frames
+
+        # DMA -> state roll-up, computed once so switching views never re-queries
+        self._dma_by_state = pd.DataFrame()
+        dma = frames.get('DMA')
+        if dma is not None and not dma.empty:
+            columns = self.keyword_columns(dma)
+            grouped = dma.groupby('state')[columns]
+            self._dma_by_state = grouped.mean().join(grouped.size().rename('markets'))
+
+    def keyword_columns(self, df):
+        """list: Columns of df that hold interest values."""
+        return [c for c in df.columns if c in self.keywords]
+
+    def level(self, resolution):
+        """
+        Get the frame for one resolution.
+
+        Args:
+            resolution (str): REGION, DMA or CITY
+
+        Returns:
+            pandas.DataFrame: Interest by area (empty if that resolution is unavailable)
+        """
+        df = self.frames.get(resolution)
+        return df if df is not None else pd.DataFrame()
+
+    def rollup(self):
+        """
+        Average DMA interest up to state level.
+
+        Returns:
+            pandas.DataFrame: Mean interest per keyword and number of markets, indexed by region code
+        """
+        return self._dma_by_state
+
+    def drilldown(self, region_code):
+        """
+        List the media markets within a state.
+
+        Args:
+            region_code (str): Region code such as 'US-CA'
+
+        Returns:
+            pandas.DataFrame: DMA rows whose home state is region_code
+        """
+        dma = self.level('DMA')
+        if dma.empty:
+            return dma
+        return dma[dma['state'] == region_code]
+
+
+class RegionalExplorer:
+    """Fetches REGION, DMA and CITY interest concurrently and caches each resolution."""
+
+    def __init__(self, budget=None, max_workers=len(LEVELS), ttl=3600, max_entries=256):
+        """
+        Initialize the explorer.
+
+        Args:
+            budget (RequestBudget): Optional request budget shared by the scraper threads
+            max_workers (int): Maximum number of resolutions fetched at once
+            ttl (float): Seconds a cached resolution stays valid
+            max_entries (int): Maximum number of cached frames; the least recently used go first
+        """
+        self.budget = budget
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="regional")
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._scrapers = ThreadScrapers(budget)
+
+    def _fetch_level(self, resolution, keywords, timeframe, geo):
+        df = self._scrapers.get().get_interest_by_region(
+            keywords, timeframe, geo, resolution=resolution, inc_geo_code=True
+        )
+        if df.empty:
+            return df
+
+        # Precompute the columns the roll-ups and maps need
+        if resolution == 'DMA':
+            df['state'] = dma_states(df.index).to_numpy()
+        elif resolution == 'CITY' and 'coordinates' in df.columns:
+            df['lat'] = df['coordinates'].str.get('lat')
+            df['lng'] = df['coordinates'].str.get('lng')
+            # The dicts are replaced by lat/lng; dropping them keeps the frame hashable
+            df = df.drop(columns='coordinates')
+        return df
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _store(self, key, df):
+        now = time.monotonic()
+        with self._lock:
+            # Drop expired entries as well, so the shared cache only holds data that can still be served
+            for old_key in [k for k, (stored_at, _) in self._cache.items() if now - stored_at > self.ttl]:
+                del self._cache[old_key]
+            self._cache[key] = (now, df)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def fetch(self, keywords, timeframe="now 7-d", geo="US", levels=LEVELS):
+        """
+        Get interest by region at several resolutions, fetching only uncached ones.
+
+        Args:
+            keywords (list): List of keywords to get data for
+            timeframe (str): Time frame to retrieve data
+            geo (str): Geographic location (always US)
+            levels (tuple): Resolutions to fetch
+
+        Returns:
+            RegionalData: Frames for every resolution that could be fetched
+        """
+        # Cache and fetch by canonical keywords so reordered or recased
+        # requests share entries, then label columns as this caller asked
+        keywords = parse_keywords(keywords)
+        canonical = keywords_key(keywords)
+        frames = {}
+        pending = {}
+        for resolution in levels:
+            key = (resolution, canonical, timeframe, geo)
+            df = self._cached(key)
+            if df is not None:
+                frames[resolution] = remap_columns(df, keywords)
+            else:
+                pending[resolution] = (key, self.executor.submit(
+                    self._fetch_level, resolution, list(canonical), timeframe, geo
+                ))
+
+        for resolution, (key, future) in pending.items():
+            df = future.result()
+            frames[resolution] = remap_columns(df, keywords)
+            # Failed fetches come back empty; don't cache those
+            if not df.empty:
+                self._store(key, df)
+
+        return RegionalData(keywords, frames)
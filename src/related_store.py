@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['keyword', 'source', 'kind', 'rank', 'text', 'value', 'fetched_at']
+CATEGORICAL_COLUMNS = ['keyword', 'source', 'kind', 'text']
+GROUP_COLUMNS = ['keyword', 'source', 'kind']
+
+# (source, column holding the text in the pytrends frames)
+SOURCES = (('topic', 'topic_title'), ('query', 'query'))
+KINDS = ('top', 'rising')
+
+
+def _empty_table():
+    table = pd.DataFrame({column: pd.Series(dtype='object') for column in COLUMNS})
+    table['rank'] = table['rank'].astype('int32')
+    table['value'] = table['value'].astype('float64')
+    table['fetched_at'] = table['fetched_at'].astype('datetime64[ns]')
+    return table
+
+
+class RelatedStore:
+    """Long-format table of related topics and queries for many keywords.
+
+    Each row is one related topic or query:
+
+        keyword, source ('topic' or 'query'), kind ('top' or 'rising'),
+        rank (1-based), text, value, fetched_at
+
+    Rows are kept sorted by keyword, source, kind and rank, so the rows of any
+    keyword (or keyword/source/kind group) form one contiguous slice.
+
+    failed lists the (keyword, source) pairs whose fetch raised, so a missing
+    group can be told apart from one Google returned empty.
+    """
+
+    def __init__(self, table=None, failed=()):
+        """
+        Initialize the store from a long-format table.
+
+        Args:
+            table (pandas.DataFrame): Table with the columns in COLUMNS (empty if omitted)
+            failed (iterable): (keyword, source) pairs that could not be fetched
+        """
+        self.failed = [tuple(pair) for pair in failed]
+        if table is None:
+            table = _empty_table()
+
+        table = table[COLUMNS].astype({column: 'category' for column in CATEGORICAL_COLUMNS})
+        table['rank'] = table['rank'].astype('int32')
+        table['value'] = table['value'].astype('float64')
+        table['fetched_at'] = pd.to_datetime(table['fetched_at'])
+        self.table = table.sort_values(GROUP_COLUMNS + ['rank'], kind='stable').reset_index(drop=True)
+        self._index_groups()
+
+    def _index_groups(self):
+        """Record the row range of every keyword and keyword/source/kind group."""
+        self._groups = {}
+        self._keywords = {}
+        if self.table.empty:
+            return
+
+        codes = np.column_stack([self.table[c].cat.codes.to_numpy() for c in GROUP_COLUMNS])
+        changed = np.ones(len(codes), dtype=bool)
+        changed[1:] = (codes[1:] != codes[:-1]).any(axis=1)
+        starts = np.flatnonzero(changed)
+        stops = np.append(starts[1:], len(codes))
+
+        group_keys = self.table.loc[starts, GROUP_COLUMNS].itertuples(index=False, name=None)
+        for key, start, stop in zip(group_keys, starts.tolist(), stops.tolist()):
+            self._groups[key] = (start, stop)
+            first, _ = self._keywords.get(key[0], (start, stop))
+            self._keywords[key[0]] = (first, stop)
+
+    @classmethod
+    def from_related(cls, related_topics=None, related_queries=None, fetched_at=None, failed=()):
+        """
+        Build a store from the nested dicts returned by TrendsScraper.
+
+        Args:
+            related_topics (dict): Output of TrendsScraper.get_related_topics
+            related_queries (dict): Output of TrendsScraper.get_related_queries
+            fetched_at (datetime): Time of the scrape (defaults to now)
+            failed (iterable): (keyword, source) pairs that could not be fetched
+
+        Returns:
+            RelatedStore: The combined table
+        """
+        fetched_at = pd.Timestamp(fetched_at) if fetched_at is not None else pd.Timestamp.now()
+
+        frames = []
+        for (source, column), data in zip(SOURCES, (related_topics, related_queries)):
+            for keyword, kinds in (data or {}).items():
+                for kind in KINDS:
+                    df = (kinds or {}).get(kind)
+                    if df is None or df.empty or column not in df.columns:
+                        continue
+                    frames.append(pd.DataFrame({
+                        'keyword': keyword,
+                        'source': source,
+                        'kind': kind,
+                        'rank': np.arange(1, len(df) + 1, dtype='int32'),
+                        'text': df[column].astype(str).to_numpy(),
+                        'value': pd.to_numeric(df['value'], errors='coerce').to_numpy()
+                        if 'value' in df.columns else np.nan,
+                        'fetched_at': fetched_at
+                    }))
+
+        if not frames:
+            return cls(failed=failed)
+        return cls(pd.concat(frames, ignore_index=True), failed=failed)
+
+    def __len__(self):
+        return len(self.table)
+
+    @property
+    def failed_keywords(self):
+        """list: Keywords with at least one source that could not be fetched."""
+        return list(dict.fromkeys(keyword for keyword, _ in self.failed))
+
+    @property
+    def keywords(self):
+        """list: Keywords in the store, in table order."""
+        return list(self._keywords)
+
+    def view(self, keyword, source=None, kind=None):
+        """
+        Get the rows for one keyword without copying the table.
+
+        Args:
+            keyword (str): Keyword to select
+            source (str): Optionally restrict to 'topic' or 'query'
+            kind (str): Optionally restrict to 'top' or 'rising' (requires source)
+
+        Returns:
+            pandas.DataFrame: Slice of the table (empty if there are no matching rows)
+        """
+        if source is None:
+            start, stop = self._keywords.get(keyword, (0, 0))
+        elif kind is None:
+            starts = [self._groups[(keyword, source, k)] for k in KINDS if (keyword, source, k) in self._groups]
+            start = min((s for s, _ in starts), default=0)
+            stop = max((e for _, e in starts), default=0)
+        else:
+            start, stop = self._groups.get((keyword, source, kind), (0, 0))
+        return self.table.iloc[start:stop]
+
+    def memory_usage(self):
+        """int: Bytes used by the table, including category dictionaries."""
+        return int(self.table.memory_usage(deep=True).sum())
+
+    def to_parquet(self, path):
+        """
+        Write the table to a Parquet file.
+
+        Args:
+            path (str): Destination file
+        """
+        self.table.to_parquet(path, index=False)
+
+    @classmethod
+    def read_parquet(cls, path, failed=()):
+        """
+        Load a store written by to_parquet.
+
+        Args:
+            path (str): Parquet file
+            failed (iterable): (keyword, source) pairs that could not be fetched
+
+        Returns:
+            RelatedStore: The loaded store
+        """
+        return cls(pd.read_parquet(path), failed=failed)
@@ -0,0 +1,344 @@
+"""
+Local HTTP API exposing TrendsScraper and ArticleGenerator to other tools.
+
+Run with:
+
+    python -m src.service --port 8080
+
+Endpoints:
+
+    GET  /interest?keywords=a,b&timeframe=now 7-d&geo=US
+    GET  /related?keywords=a,b&kind=topics|queries&timeframe=now 7-d&geo=US
+    GET  /region?keywords=a,b&resolution=REGION&timeframe=now 7-d&geo=US
+    POST /article   {"keyword": ..., "tone": ..., "length": ..., "seed": ..., "max_attempts": ..., "timeframe": ...}
+"""
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from src.article_cache import ArticleCache
+from src.article_generator import ArticleGenerator
+from src.dedup import DEFAULT_DEDUP_PATH, SharedDuplicateDetector, generate_distinct_article
+from src.keywords import keywords_key, normalize_keyword, parse_keywords, remap_columns
+from src.rate_limit import RequestBudget, SharedRequestBudget
+from src.related_store import RelatedStore
+from src.topic_index import DEFAULT_INDEX_PATH, TopicIndex
+from src.trends_scraper import ThreadScrapers
+from src.work_queue import DEFAULT_QUEUE_PATH
+
+# Results with more rows than this are streamed as newline-delimited JSON
+STREAM_THRESHOLD = 1000
+STREAM_CHUNK_ROWS = 500
+
+RESOLUTIONS = ("COUNTRY", "REGION", "CITY", "DMA")
+LENGTHS = ("short", "medium", "long")
+MAX_ARTICLE_ATTEMPTS = 10
+
+
+def frame_records(df):
+    """
+    Convert a DataFrame to JSON-safe records, keeping its index as a column.
+
+    Args:
+        df (pandas.DataFrame): DataFrame to convert
+
+    Returns:
+        list: One dict per row
+    """
+    if df is None or df.empty:
+        return []
+    return json.loads(df.reset_index().to_json(orient='records', date_format='iso'))
+
+
+class TrendsService:
+    """Runs blocking scraper calls in a bounded executor and coalesces identical requests."""
+
+    def __init__(self, max_workers=4, budget=None, article_cache=None, detector=None, topic_index=None):
+        """
+        Initialize the service.
+
+        Args:
+            max_workers (int): Maximum number of scraper calls running at once
+            budget (RequestBudget): Request budget shared by all scraper threads
+            article_cache (ArticleCache): Cache used for generated articles
+            detector (NearDuplicateDetector): Index of generated articles, shared with the workers
+            topic_index (TopicIndex): Index that scraped related data is added to, shared with the app and workers
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trends")
+        self.render_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="render")
+        self.budget = budget or RequestBudget()
+        self.article_cache = article_cache if article_cache is not None else ArticleCache()
+        self.detector = detector if detector is not None else SharedDuplicateDetector()
+        self.topic_index = topic_index if topic_index is not None else TopicIndex.load()
+        self.generator = ArticleGenerator()
+        self.coalesced = 0
+        self._inflight = {}
+        self._scrapers = ThreadScrapers(self.budget)
+
+    def _call_scraper(self, method, *args):
+        return getattr(self._scrapers.get(), method)(*args)
+
+    def _fetch_related(self, method, canonical, timeframe, geo):
+        """Scrape one keyword's related topics or queries and add them to the topic index."""
+        result = self._call_scraper(method, [canonical], timeframe, geo)
+        data = {canonical: result.get(canonical, {})}
+        if method == 'get_related_topics':
+            store = RelatedStore.from_related(related_topics=data)
+        else:
+            store = RelatedStore.from_related(related_queries=data)
+        self.topic_index.ingest_store(store)
+        self.topic_index.flush()
+        return result
+
+    async def _coalesced(self, key, func, *args, executor=None):
+        """
+        Run func in the executor, sharing the result with identical in-flight requests.
+
+        Args:
+            key (tuple): Identity of the request
+            func (callable): Blocking function to run
+            *args: Arguments for func
+            executor (Executor): Executor to run in (defaults to the scraper executor)
+
+        Returns:
+            The result of func
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = asyncio.ensure_future(
+                loop.run_in_executor(executor or self.executor, func, *args)
+            )
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # Shield so one client disconnecting doesn't cancel the call for everyone else
+        return await asyncio.shield(future)
+
+    async def interest(self, keywords, timeframe, geo):
+        # Coalesce on canonical keywords, then relabel for this caller
+        canonical = keywords_key(keywords)
+        key = ('interest', canonical, timeframe, geo)
+        df = await self._coalesced(
+            key, self._call_scraper, 'get_interest_over_time', list(canonical), timeframe, geo
+        )
+        return remap_columns(df, keywords)
+
+    async def related(self, keywords, kind, timeframe, geo):
+        method = 'get_related_topics' if kind == 'topics' else 'get_related_queries'
+
+        # Coalesce per keyword so overlapping keyword lists share scrapes
+        async def fetch(keyword):
+            canonical = normalize_keyword(keyword)
+            key = ('related', kind, canonical, timeframe, geo)
+            result = await self._coalesced(
+                key, self._fetch_related, method, canonical, timeframe, geo
+            )
+            return result.get(canonical, {})
+
+        results = await asyncio.gather(*(fetch(k) for k in keywords))
+        return dict(zip(keywords, results))
+
+    async def region(self, keywords, resolution, timeframe, geo):
+        canonical = keywords_key(keywords)
+        key = ('region', canonical, resolution, timeframe, geo)
+        df = await self._coalesced(
+            key, self._call_scraper, 'get_interest_by_region', list(canonical), timeframe, geo, resolution
+        )
+        return remap_columns(df, keywords)
+
+    async def article(self, keyword, tone, length, seed, timeframe, geo, max_attempts=5):
+        topics, queries = await asyncio.gather(
+            self.related([keyword], 'topics', timeframe, geo),
+            self.related([keyword], 'queries', timeframe, geo)
+        )
+        key = ('article', keyword, tone, length, seed, timeframe, geo, max_attempts)
+        # Rendering is CPU-only, so keep it off the budgeted scraper executor.
+        # Near-duplicates of earlier articles are regenerated with the next seeds
+        return await self._coalesced(
+            key,
+            lambda: generate_distinct_article(
+                self.generator, self.detector, keyword, topics[keyword], queries[keyword],
+                tone=tone, length=length, seed=seed, max_attempts=max_attempts,
+                cache=self.article_cache
+            ),
+            executor=self.render_executor
+        )
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.render_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_keywords(request):
+    keywords = parse_keywords(request.query.get('keywords', ''))
+    if not keywords:
+        raise web.HTTPBadRequest(text="'keywords' is required")
+    return keywords
+
+
+async def _respond_records(request, records):
+    """Send records as JSON, or stream them as NDJSON when there are many."""
+    if len(records) <= STREAM_THRESHOLD:
+        return web.json_response(records)
+
+    response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+    await response.prepare(request)
+    for start in range(0, len(records), STREAM_CHUNK_ROWS):
+        chunk = records[start:start + STREAM_CHUNK_ROWS]
+        await response.write("".join(json.dumps(r) + "\n" for r in chunk).encode('utf-8'))
+    await response.write_eof()
+    return response
+
+
+async def handle_interest(request):
+    service = request.app['service']
+    df = await service.interest(
+        _parse_keywords(request),
+        request.query.get('timeframe', 'now 7-d'),
+        request.query.get('geo', 'US')
+    )
+    return await _respond_records(request, frame_records(df))
+
+
+async def handle_related(request):
+    service = request.app['service']
+    kind = request.query.get('kind', 'topics')
+    if kind not in ('topics', 'queries'):
+        raise web.HTTPBadRequest(text="'kind' must be 'topics' or 'queries'")
+
+    related = await service.related(
+        _parse_keywords(request),
+        kind,
+        request.query.get('timeframe', 'now 7-d'),
+        request.query.get('geo', 'US')
+    )
+
+    # Flatten to one record per row so large results can be streamed
+    records = []
+    for keyword, frames in related.items():
+        for ranking in ('top', 'rising'):
+            for record in frame_records((frames or {}).get(ranking)):
+                records.append({'keyword': keyword, 'ranking': ranking, **record})
+    return await _respond_records(request, records)
+
+
+async def handle_region(request):
+    service = request.app['service']
+    resolution = request.query.get('resolution', 'REGION').upper()
+    if resolution not in RESOLUTIONS:
+        raise web.HTTPBadRequest(text=f"'resolution' must be one of {', '.join(RESOLUTIONS)}")
+
+    df = await service.region(
+        _parse_keywords(request),
+        resolution,
+        request.query.get('timeframe', 'now 7-d'),
+        request.query.get('geo', 'US')
+    )
+    return await _respond_records(request, frame_records(df))
+
+
+def _is_integer(value):
+    # JSON true/false decode to bool, which is an int subclass
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+async def handle_article(request):
+    service = request.app['service']
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="Request body must be JSON")
+
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Request body must be a JSON object")
+
+    keyword = str(body.get('keyword', '')).strip()
+    if not keyword:
+        raise web.HTTPBadRequest(text="'keyword' is required")
+
+    tone = body.get('tone', 'informative')
+    if tone not in service.generator.templates:
+        raise web.HTTPBadRequest(text=f"'tone' must be one of {', '.join(service.generator.templates)}")
+
+    length = body.get('length', 'medium')
+    if length not in LENGTHS:
+        raise web.HTTPBadRequest(text=f"'length' must be one of {', '.join(LENGTHS)}")
+
+    seed = body.get('seed', 0)
+    if seed is not None and not _is_integer(seed):
+        raise web.HTTPBadRequest(text="'seed' must be an integer or null")
+
+    max_attempts = body.get('max_attempts', 5)
+    if not _is_integer(max_attempts) or not 1 <= max_attempts <= MAX_ARTICLE_ATTEMPTS:
+        raise web.HTTPBadRequest(text=f"'max_attempts' must be an integer from 1 to {MAX_ARTICLE_ATTEMPTS}")
+
+    timeframe = body.get('timeframe', 'now 7-d')
+    geo = body.get('geo', 'US')
+    if not isinstance(timeframe, str) or not isinstance(geo, str):
+        raise web.HTTPBadRequest(text="'timeframe' and 'geo' must be strings")
+
+    article, tone, seed, duplicates = await service.article(keyword, tone, length, seed, timeframe, geo, max_attempts)
+    return web.json_response({
+        'keyword': keyword,
+        'article': article,
+        'tone': tone,
+        'seed': seed,
+        'duplicates': [{'article_id': article_id, 'similarity': similarity} for article_id, similarity in duplicates]
+    })
+
+
+def create_app(service=None):
+    """
+    Build the aiohttp application.
+
+    Args:
+        service (TrendsService): Service to expose (a default one is created if omitted)
+
+    Returns:
+        aiohttp.web.Application: The application
+    """
+    app = web.Application()
+    app['service'] = service or TrendsService()
+    app.router.add_get('/interest', handle_interest)
+    app.router.add_get('/related', handle_related)
+    app.router.add_get('/region', handle_region)
+    app.router.add_post('/article', handle_article)
+
+    async def on_cleanup(app):
+        app['service'].shutdown()
+
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Google Trends data and generated articles over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent scraper calls")
+    parser.add_argument("--db", default=DEFAULT_QUEUE_PATH, help="Database holding the request budget shared with the workers and the app")
+    parser.add_argument("--rate", type=float, default=0.5, help="Google Trends requests per second across the service, workers and app")
+    parser.add_argument("--burst", type=int, default=3, help="Maximum burst of Google Trends requests across the service, workers and app")
+    parser.add_argument("--dedup-db", default=DEFAULT_DEDUP_PATH, help="Near-duplicate index shared with the workers")
+    parser.add_argument("--topic-index", default=DEFAULT_INDEX_PATH, help="Topic index shared with the app and the workers")
+    args = parser.parse_args()
+    if args.rate <= 0 or args.burst < 1:
+        parser.error("--rate must be positive and --burst at least 1")
+
+    service = TrendsService(
+        max_workers=args.workers,
+        budget=SharedRequestBudget(args.db, rate=args.rate, burst=args.burst),
+        detector=SharedDuplicateDetector(args.dedup_db),
+        topic_index=TopicIndex.load(args.topic_index)
+    )
+    web.run_app(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
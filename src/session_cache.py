@@ -0,0 +1,132 @@
+import hashlib
+import sys
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def estimate_size(value):
+    """
+    Estimate the memory held by a session value.
+
+    Args:
+        value: DataFrame, RelatedStore, RegionalData, str, dict/list of these, or any object
+
+    Returns:
+        int: Approximate size in bytes
+    """
+    if value is None:
+        return 0
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage())
+    if isinstance(getattr(value, 'frames', None), dict):
+        return sum(estimate_size(df) for df in value.frames.values())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def frame_hash(df):
+    """
+    Hash a DataFrame's contents, index and columns.
+
+    Args:
+        df (pandas.DataFrame): DataFrame to hash
+
+    Returns:
+        str: Hex digest that changes whenever the data changes
+    """
+    if df is None:
+        return "none"
+    digest = hashlib.sha256()
+    digest.update(repr(list(df.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+class BoundedCache:
+    """LRU mapping capped by item count and estimated memory, for per-session state."""
+
+    def __init__(self, max_items=10, max_bytes=None, on_evict=None):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_items (int): Maximum number of entries
+            max_bytes (int): Maximum total estimated size of the entries (None for no limit)
+            on_evict (callable): Called with (key, value) for every evicted entry
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def keys(self):
+        """list: Keys from least to most recently used."""
+        return list(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Look up an entry, marking it as recently used.
+
+        Args:
+            key: Entry key
+            default: Returned if the key is missing
+
+        Returns:
+            The cached value, or default
+        """
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        """
+        Add or replace an entry, evicting least recently used entries to stay within the caps.
+
+        The newest entry is always kept, even if it alone exceeds max_bytes.
+
+        Args:
+            key: Entry key
+            value: Value to store
+        """
+        if key in self._entries:
+            self.total_bytes -= self._sizes[key]
+
+        size = estimate_size(value)
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self.total_bytes += size
+
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_items
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            old_key, old_value = self._entries.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(old_key)
+            if self.on_evict is not None:
+                self.on_evict(old_key, old_value)
+
+    def clear(self):
+        for key, value in list(self._entries.items()):
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+        self._entries.clear()
+        self._sizes.clear()
+        self.total_bytes = 0
@@ -0,0 +1,344 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from src.keywords import keywords_key, normalize_keyword
+from src.related_store import RelatedStore
+from src.utils import create_comparison_chart
+
+DEFAULT_SNAPSHOT_DIR = os.path.join("data", "snapshots")
+
+Snapshot = namedtuple('Snapshot', ['id', 'meta', 'interest', 'related'])
+
+
+class SnapshotStore:
+    """Keeps every scrape on disk so later scrapes can be compared against it.
+
+    Each snapshot is a directory holding interest.parquet, related.parquet
+    and meta.json (keywords, timeframe, geo and when it was taken). Metadata
+    is indexed in memory and only re-read when the directory changes.
+    """
+
+    def __init__(self, root=DEFAULT_SNAPSHOT_DIR, max_per_search=50):
+        """
+        Initialize the store.
+
+        Args:
+            root (str): Directory snapshots are written to
+            max_per_search (int): Snapshots kept per keywords/timeframe/geo; older ones are deleted
+        """
+        self.root = root
+        self.max_per_search = max_per_search
+        os.makedirs(root, exist_ok=True)
+        self._meta = {}
+        self._scanned = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _search_key(meta):
+        return (tuple(meta['keywords_key']), meta['timeframe'], meta['geo'])
+
+    def _refresh(self):
+        """Re-read metadata if snapshots were added or removed, e.g. by another process."""
+        mtime = os.stat(self.root).st_mtime_ns
+        if mtime == self._scanned:
+            return
+
+        index = {}
+        for name in os.listdir(self.root):
+            meta = self._meta.get(name)
+            if meta is None:
+                meta_path = os.path.join(self.root, name, "meta.json")
+                if not os.path.exists(meta_path):
+                    continue
+                try:
+                    with open(meta_path, encoding='utf-8') as f:
+                        meta = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Error reading snapshot {name}: {str(e)}")
+                    continue
+            index[name] = meta
+
+        self._meta = index
+        self._scanned = mtime
+
+    def save(self, interest, related, keywords, timeframe, geo, taken_at=None):
+        """
+        Write a snapshot of one scrape.
+
+        Scrapes whose interest frame is empty are skipped: TrendsScraper reports
+        errors by returning empty results. Related data that failed for some
+        keywords is recorded in meta.json and left out of later diffs, so the
+        failure does not show up as every term being dropped.
+
+        Args:
+            interest (pandas.DataFrame): Interest over time from TrendsScraper
+            related (RelatedStore): Related topics and queries
+            keywords (list): Keywords that were scraped
+            timeframe (str): Time frame of the scrape
+            geo (str): Geographic location of the scrape
+            taken_at (datetime): When the scrape ran (defaults to now)
+
+        Returns:
+            str: Snapshot id, or None if the scrape was empty
+        """
+        if interest is None or interest.empty:
+            return None
+
+        taken_at = pd.Timestamp(taken_at) if taken_at is not None else pd.Timestamp.now()
+        key = keywords_key(keywords)
+        digest = hashlib.sha256(json.dumps([key, timeframe, geo]).encode('utf-8')).hexdigest()[:8]
+        snapshot_id = f"{taken_at.strftime('%Y%m%dT%H%M%S%f')}-{digest}"
+
+        path = os.path.join(self.root, snapshot_id)
+        os.makedirs(path, exist_ok=True)
+        interest.to_parquet(os.path.join(path, "interest.parquet"))
+        related.to_parquet(os.path.join(path, "related.parquet"))
+
+        meta = {
+            'id': snapshot_id,
+            'keywords': list(keywords),
+            'keywords_key': list(key),
+            'timeframe': timeframe,
+            'geo': geo,
+            'taken_at': taken_at.isoformat(timespec='seconds'),
+            'related_failed': [list(pair) for pair in related.failed]
+        }
+        # meta.json is written last, so list() never sees a half-written snapshot
+        with open(os.path.join(path, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        with self._lock:
+            self._refresh()
+            self._meta[snapshot_id] = meta
+            self._prune(self._search_key(meta))
+
+        return snapshot_id
+
+    def _prune(self, search_key):
+        """Delete the oldest snapshots of a search beyond max_per_search."""
+        ids = sorted((i for i, meta in self._meta.items() if self._search_key(meta) == search_key), reverse=True)
+        for snapshot_id in ids[self.max_per_search:]:
+            shutil.rmtree(os.path.join(self.root, snapshot_id), ignore_errors=True)
+            del self._meta[snapshot_id]
+
+    def list(self, keywords=None, timeframe=None, geo=None):
+        """
+        List snapshots, newest first.
+
+        Args:
+            keywords (list): Only list snapshots of this keyword set (in any order or casing)
+            timeframe (str): Only list snapshots with this time frame
+            geo (str): Only list snapshots of this region ('' is worldwide)
+
+        Returns:
+            list: Snapshot metadata dicts
+        """
+        wanted = list(keywords_key(keywords)) if keywords is not None else None
+
+        with self._lock:
+            self._refresh()
+            snapshots = [
+                meta for meta in self._meta.values()
+                if (wanted is None or meta.get('keywords_key') == wanted)
+                and (timeframe is None or meta.get('timeframe') == timeframe)
+                and (geo is None or meta.get('geo') == geo)
+            ]
+
+        snapshots.sort(key=lambda meta: meta['id'], reverse=True)
+        return snapshots
+
+    def load(self, snapshot_id):
+        """
+        Read a snapshot back.
+
+        Args:
+            snapshot_id (str): Id returned by save()
+
+        Returns:
+            Snapshot: Metadata, interest DataFrame and RelatedStore
+        """
+        path = os.path.join(self.root, snapshot_id)
+        with open(os.path.join(path, "meta.json"), encoding='utf-8') as f:
+            meta = json.load(f)
+        interest = pd.read_parquet(os.path.join(path, "interest.parquet"))
+        related = RelatedStore.read_parquet(os.path.join(path, "related.parquet"), failed=meta.get('related_failed', ()))
+        return Snapshot(snapshot_id, meta, interest, related)
+
+
+def _interest_summary(df):
+    """Mean, latest and peak interest per keyword, indexed by canonical keyword."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=['label', 'mean', 'latest', 'peak'])
+
+    summary = pd.DataFrame({
+        'label': df.columns,
+        'mean': df.mean().to_numpy(),
+        'latest': df.iloc[-1].to_numpy(),
+        'peak': df.max().to_numpy()
+    })
+    summary.index = [normalize_keyword(c) for c in df.columns]
+    return summary
+
+
+def diff_interest(old, new):
+    """
+    Compare interest over time between two snapshots.
+
+    Args:
+        old (pandas.DataFrame): Earlier interest over time
+        new (pandas.DataFrame): Later interest over time
+
+    Returns:
+        pandas.DataFrame: One row per keyword with old/new mean, latest and peak
+            interest and their deltas (NaN where a keyword is only in one snapshot)
+    """
+    before = _interest_summary(old)
+    after = _interest_summary(new)
+    joined = before.join(after, how='outer', lsuffix='_old', rsuffix='_new')
+
+    result = pd.DataFrame(index=joined['label_new'].fillna(joined['label_old']).rename('keyword'))
+    for metric in ('mean', 'latest', 'peak'):
+        old_values = joined[f'{metric}_old'].astype('float64').to_numpy()
+        new_values = joined[f'{metric}_new'].astype('float64').to_numpy()
+        result[f'{metric}_old'] = old_values
+        result[f'{metric}_new'] = new_values
+        result[f'{metric}_delta'] = new_values - old_values
+
+    return result.sort_values('mean_delta', ascending=False, key=lambda s: s.abs())
+
+
+def _canonical(column):
+    """Canonical keys for a categorical column, normalizing each category once rather than each row."""
+    column = column.astype('category')
+    categories = np.array([normalize_keyword(c) for c in column.cat.categories], dtype=object)
+    return categories[column.cat.codes.to_numpy()]
+
+
+def _related_keys(store):
+    """Related rows with canonical join keys."""
+    table = store.table
+    return pd.DataFrame({
+        'keyword_key': _canonical(table['keyword']),
+        'source': table['source'].astype(str).to_numpy(),
+        'kind': table['kind'].astype(str).to_numpy(),
+        'text_key': _canonical(table['text']),
+        'keyword': table['keyword'].astype(str).to_numpy(),
+        'text': table['text'].astype(str).to_numpy(),
+        'rank': table['rank'].to_numpy(),
+        'value': table['value'].to_numpy()
+    }).drop_duplicates(['keyword_key', 'source', 'kind', 'text_key'])
+
+
+def diff_related(old, new):
+    """
+    Compare related topics and queries between two snapshots.
+
+    Args:
+        old (RelatedStore): Earlier related data
+        new (RelatedStore): Later related data
+
+    Returns:
+        pandas.DataFrame: One row per (keyword, source, kind, text) with a status of
+            'new', 'dropped' or 'kept', old/new rank and value, rank_move (positive
+            means the entry moved up) and value_delta. Keyword/source pairs that
+            failed in either snapshot are left out.
+    """
+    keys = ['keyword_key', 'source', 'kind', 'text_key']
+    merged = _related_keys(old).merge(
+        _related_keys(new), on=keys, how='outer', suffixes=('_old', '_new'), indicator=True
+    )
+    failed = {(normalize_keyword(keyword), source) for keyword, source in old.failed + new.failed}
+    if failed:
+        pairs = zip(merged['keyword_key'], merged['source'])
+        merged = merged[[pair not in failed for pair in pairs]]
+
+    result = pd.DataFrame({
+        'keyword': merged['keyword_new'].fillna(merged['keyword_old']),
+        'source': merged['source'],
+        'kind': merged['kind'],
+        'text': merged['text_new'].fillna(merged['text_old']),
+        'status': merged['_merge'].map({'right_only': 'new', 'left_only': 'dropped', 'both': 'kept'}).astype(str),
+        'rank_old': merged['rank_old'],
+        'rank_new': merged['rank_new'],
+        'rank_move': merged['rank_old'] - merged['rank_new'],
+        'value_old': merged['value_old'],
+        'value_new': merged['value_new'],
+        'value_delta': merged['value_new'] - merged['value_old']
+    })
+    return result.astype({
+        'keyword': 'category', 'source': 'category', 'kind': 'category', 'status': 'category',
+        'rank_old': 'Int32', 'rank_new': 'Int32', 'rank_move': 'Int32'
+    })
+
+
+class SnapshotDiff:
+    """Differences between two snapshots of the same searches."""
+
+    def __init__(self, old, new):
+        """
+        Compute the diff.
+
+        Args:
+            old (Snapshot): Earlier snapshot
+            new (Snapshot): Later snapshot
+        """
+        self.old = old
+        self.new = new
+        self.interest = diff_interest(old.interest, new.interest)
+        self.related = diff_related(old.related, new.related)
+
+    @property
+    def new_entrants(self):
+        """pandas.DataFrame: Related topics and queries that appeared since the old snapshot."""
+        rows = self.related[self.related['status'] == 'new']
+        return rows[['keyword', 'source', 'kind', 'text', 'rank_new', 'value_new']].sort_values(['keyword', 'source', 'kind', 'rank_new'])
+
+    @property
+    def dropped(self):
+        """pandas.DataFrame: Related topics and queries that are no longer listed."""
+        rows = self.related[self.related['status'] == 'dropped']
+        return rows[['keyword', 'source', 'kind', 'text', 'rank_old', 'value_old']].sort_values(['keyword', 'source', 'kind', 'rank_old'])
+
+    @property
+    def rank_moves(self):
+        """pandas.DataFrame: Entries listed in both snapshots whose rank changed, biggest moves first."""
+        rows = self.related[(self.related['status'] == 'kept') & (self.related['rank_move'] != 0)]
+        return rows[['keyword', 'source', 'kind', 'text', 'rank_old', 'rank_new', 'rank_move', 'value_delta']].sort_values(
+            'rank_move', ascending=False, key=lambda s: s.abs()
+        )
+
+    def interest_chart(self):
+        """
+        Chart mean interest before and after, next to the change in mean and latest interest.
+
+        Returns:
+            plotly.graph_objects.Figure: Plotly figure object with subplots
+        """
+        levels = pd.DataFrame({
+            'Before': self.interest['mean_old'],
+            'After': self.interest['mean_new']
+        })
+        changes = pd.DataFrame({
+            'Mean change': self.interest['mean_delta'],
+            'Latest change': self.interest['latest_delta']
+        })
+        return create_comparison_chart(levels, changes, "Mean Interest", "Change in Interest")
+
+    def related_chart(self):
+        """
+        Chart new and dropped related entries per keyword.
+
+        Returns:
+            plotly.graph_objects.Figure: Plotly figure object with subplots
+        """
+        counts = pd.crosstab(self.related['keyword'], self.related['status'])
+        new = counts.reindex(columns=['new'], fill_value=0).rename(columns={'new': 'New entries'})
+        dropped = counts.reindex(columns=['dropped'], fill_value=0).rename(columns={'dropped': 'Dropped entries'})
+        return create_comparison_chart(new, dropped, "New Related Entries", "Dropped Related Entries")
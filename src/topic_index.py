@@ -0,0 +1,375 @@
+import json
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock, so only one process may write the index there
+    fcntl = None
+
+from src.keywords import normalize_keyword
+
+# Related queries/topics come in two flavours: 'top' values are relative
+# scores on a 0-100 scale, 'rising' values are percentage increases that can
+# run into the thousands. Both are capped and scaled to 0-1 edge weights.
+WEIGHT_CAPS = {
+    'top': 100.0,
+    'rising': 5000.0
+}
+
+DEFAULT_INDEX_PATH = os.path.join("data", "topic_index.json")
+
+# The append log is folded into the JSON file once it holds more postings than
+# the index itself (and at least this many), so compaction costs stay amortized
+MIN_COMPACT_RECORDS = 10000
+
+
+def _file_stamp(path):
+    """Identity of a file's current version, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _edge_weight(kind, value):
+    """Scale a raw related-data value to a 0-1 edge weight."""
+    cap = WEIGHT_CAPS.get(kind, 100.0)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if value != value or value <= 0:  # NaN or empty
+        return 0.0
+    return min(value, cap) / cap
+
+
+class TopicIndex:
+    """Persistent inverted index and co-occurrence graph over related topics and queries.
+
+    The index is persisted as a JSON file plus an append-only log of postings
+    added since the file was last written. flush() only appends to the log,
+    so a scrape costs time proportional to its own size, not the index's.
+    A single instance can be shared between threads. Several processes on
+    one host (the app, the service and workers) can share the files: writes
+    hold a lock file and first pick up what other processes have written.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        """
+        Initialize an empty index.
+
+        Args:
+            path (str): JSON file the index is persisted to (None to keep it in memory only)
+        """
+        self.path = path
+        # term -> keyword -> "source:kind" -> {'value', 'rank', 'fetched_at'}
+        self.postings = defaultdict(dict)
+        # node -> neighbour -> weight; nodes are normalized keywords and terms
+        self.graph = defaultdict(dict)
+        # normalized text -> text as it was first seen
+        self.labels = {}
+        self.keywords = set()
+        # Postings not yet written to the log, and the number already in it
+        self._pending = []
+        self._log_records = 0
+        # Version of the JSON file last read and how far into the log has been read
+        self._stamp = False
+        self._log_offset = 0
+        self._lock = threading.RLock()
+
+    @property
+    def log_path(self):
+        """str: Append log next to the JSON file (None for in-memory indexes)."""
+        return f"{self.path}.log" if self.path is not None else None
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold the thread lock and, where supported, an exclusive lock on the index files."""
+        with self._lock:
+            if self.path is None or fcntl is None:
+                yield
+                return
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(f"{self.path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """Read postings other processes have written since this instance last looked; call with the file lock held."""
+        stamp = _file_stamp(self.path)
+        if stamp != self._stamp:
+            # The JSON file was rewritten (compacted) elsewhere, so start over from it
+            self.postings.clear()
+            self.graph.clear()
+            self.labels.clear()
+            self.keywords.clear()
+            self._read_state()
+            self._stamp = stamp
+            self._log_offset = 0
+            self._log_records = 0
+            for record in self._pending:
+                self._add_posting(*record, log=False)
+
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Another process is still writing this record
+                    break
+                self._log_offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A write interrupted mid-line; everything before it is intact
+                    continue
+                self._add_posting(*record, log=False)
+                self._log_records += 1
+
+    def _read_state(self):
+        """Load the JSON file into this (empty) index."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading topic index: {str(e)}")
+            return
+
+        self.postings.update(state.get('postings', {}))
+        self.graph.update(state.get('graph', {}))
+        self.labels.update(state.get('labels', {}))
+        self.keywords.update(state.get('keywords', []))
+
+    def refresh(self):
+        """Pick up postings written by other processes sharing the index files."""
+        if self.path is None:
+            return
+        with self._file_lock():
+            self._sync()
+
+    def __len__(self):
+        return len(self.postings)
+
+    def ingest_store(self, store):
+        """
+        Add the contents of a RelatedStore to the index.
+
+        Args:
+            store (RelatedStore): Related topics and queries to index
+
+        Returns:
+            int: Number of postings written
+        """
+        written = 0
+        table = store.table
+        rows = zip(
+            table['keyword'].tolist(), table['source'].tolist(), table['kind'].tolist(),
+            table['rank'].tolist(), table['text'].tolist(), table['value'].tolist(),
+            table['fetched_at'].tolist()
+        )
+        with self._lock:
+            for keyword, source, kind, rank, text, value, fetched_at in rows:
+                written += self._add_posting(
+                    keyword, text, source, kind, rank, value, fetched_at.isoformat(timespec='seconds')
+                )
+
+        return written
+
+    def _add_posting(self, keyword, text, source, kind, rank, value, fetched_at, log=True):
+        """Record that keyword surfaced text, and link the two in the graph."""
+        kw = normalize_keyword(keyword)
+        if not kw:
+            return 0
+        self.keywords.add(kw)
+        self.labels.setdefault(kw, keyword)
+
+        term = normalize_keyword(text) if text is not None else ""
+        if not term or term == kw:
+            return 0
+
+        value = None if value is None or value != value else float(value)
+        if log:
+            self._pending.append([keyword, str(text), source, kind, rank, value, fetched_at])
+
+        self.labels.setdefault(term, str(text))
+        self.postings[term].setdefault(kw, {})[f"{source}:{kind}"] = {
+            'value': value,
+            'rank': rank,
+            'fetched_at': fetched_at
+        }
+
+        # Keep the strongest signal seen between the two nodes
+        weight = _edge_weight(kind, value)
+        if weight > self.graph[kw].get(term, 0.0):
+            self.graph[kw][term] = weight
+            self.graph[term][kw] = weight
+        return 1
+
+    def keywords_for(self, text, since=None):
+        """
+        Find which tracked keywords surface a topic or query.
+
+        Args:
+            text (str): Topic title or query to look up
+            since (str): Only return postings fetched at or after this ISO timestamp
+
+        Returns:
+            list: Dicts with keyword, source, kind, value, rank and fetched_at, strongest first
+        """
+        hits = []
+        with self._lock:
+            matches = [(kw, dict(entries)) for kw, entries in self.postings.get(normalize_keyword(text), {}).items()]
+        for kw, entries in matches:
+            for key, entry in entries.items():
+                if since is not None and entry['fetched_at'] < since:
+                    continue
+                source, kind = key.split(":", 1)
+                hits.append({
+                    'keyword': self.labels.get(kw, kw),
+                    'source': source,
+                    'kind': kind,
+                    **entry
+                })
+
+        hits.sort(key=lambda h: _edge_weight(h['kind'], h['value']), reverse=True)
+        return hits
+
+    def expand(self, seed, hops=2, limit=20):
+        """
+        Expand a seed keyword through the co-occurrence graph.
+
+        Scores are the sum over all paths of the product of edge weights, so
+        terms reached through several strong connections rank highest.
+
+        Args:
+            seed (str): Keyword to start from
+            hops (int): Maximum path length to follow
+            limit (int): Maximum number of results to return
+
+        Returns:
+            list: (term, score, hop) tuples, best first; hop is the shortest distance from the seed
+        """
+        start = normalize_keyword(seed)
+        with self._lock:
+            return self._expand(start, hops, limit)
+
+    def _expand(self, start, hops, limit):
+        if start not in self.graph:
+            return []
+
+        scores = {}
+        distance = {start: 0}
+        frontier = {start: 1.0}
+        for hop in range(1, hops + 1):
+            next_frontier = defaultdict(float)
+            for node, score in frontier.items():
+                for neighbour, weight in self.graph[node].items():
+                    if neighbour == start:
+                        continue
+                    next_frontier[neighbour] += score * weight
+
+            for node, score in next_frontier.items():
+                scores[node] = scores.get(node, 0.0) + score
+                distance.setdefault(node, hop)
+            frontier = next_frontier
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(self.labels.get(node, node), score, distance[node]) for node, score in ranked]
+
+    def flush(self):
+        """
+        Persist postings added since the last flush by appending them to the log.
+
+        The log is folded into the JSON file once it holds more postings than
+        the index itself. Postings other processes have flushed are read first.
+        """
+        if self.path is None:
+            return
+
+        with self._file_lock():
+            if not self._pending:
+                return
+
+            self._sync()
+            with open(self.log_path, 'ab') as f:
+                f.write("".join(json.dumps(record) + "\n" for record in self._pending).encode('utf-8'))
+                self._log_offset = f.tell()
+            self._log_records += len(self._pending)
+            self._pending = []
+
+            if self._log_records > max(MIN_COMPACT_RECORDS, len(self.postings)):
+                self.save()
+
+    def save(self, path=None):
+        """
+        Write the whole index to disk as JSON.
+
+        Saving to the index's own path also clears its append log, after
+        reading what other processes have added to it.
+
+        Args:
+            path (str): Destination file (defaults to the path given at construction)
+        """
+        path = path or self.path
+        if path is None:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._file_lock():
+            if path == self.path:
+                self._sync()
+            state = {
+                'postings': self.postings,
+                'graph': self.graph,
+                'labels': self.labels,
+                'keywords': sorted(self.keywords)
+            }
+            # A unique temporary file, so concurrent saves never write to the same file
+            fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=os.path.basename(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+            if path == self.path:
+                self._pending = []
+                self._log_records = 0
+                self._log_offset = 0
+                self._stamp = _file_stamp(path)
+                if os.path.exists(self.log_path):
+                    os.remove(self.log_path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH):
+        """
+        Load an index from disk, or start an empty one if the file does not exist.
+
+        Args:
+            path (str): JSON file written by save(); its append log is replayed too
+
+        Returns:
+            TopicIndex: The loaded index
+        """
+        index = cls(path)
+        index.refresh()
+        return index
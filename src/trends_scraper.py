@@ -1,13 +1,23 @@
 from pytrends.request import TrendReq
 import pandas as pd
+import threading
 import time
 import random
+from src.related_store import RelatedStore
+from src.keywords import parse_keywords, normalize_keyword, keywords_key, remap_columns
 
 class TrendsScraper:
     """Class for fetching real Google Trends data using specific URL format."""
     
-    def __init__(self):
-        """Initialize the TrendReq client with US locale."""
+    def __init__(self, budget=None):
+        """
+        Initialize the TrendReq client with US locale.
+        
+        Args:
+            budget (RequestBudget): Optional request budget shared with other scrapers;
+                a token is taken before every HTTP request to Google Trends
+        """
+        self.budget = budget
         self.pytrends = TrendReq(
             hl='en-US',
             tz=360,
@@ -16,6 +26,16 @@ class TrendsScraper:
             backoff_factor=0.1
         )
     
+    def _request(self, method, *args, **kwargs):
+        """Call a pytrends method that makes one HTTP request, once the request budget allows it."""
+        if self.budget is not None:
+            self.budget.acquire()
+        return method(*args, **kwargs)
+    
+    def _build_payload(self, keywords, timeframe, geo):
+        """Build a pytrends payload; this fetches the widget tokens, which is a request of its own."""
+        self._request(self.pytrends.build_payload, keywords, cat=0, timeframe=timeframe, geo=geo)
+    
     def get_interest_over_time(self, keywords, timeframe="now 7-d", geo="US"):
         """
         Get interest over time data using format: trends.google.com/trends/explore?geo=US&q=keywords
@@ -29,27 +49,27 @@ class TrendsScraper:
             pandas.DataFrame: DataFrame containing interest over time data
         """
         try:
-            if isinstance(keywords, str):
-                # Convert comma-separated string to list
-                keywords = [k.strip() for k in keywords.split(',')]
+            # Accept a comma-separated string or list; drop blanks and duplicates
+            keywords = parse_keywords(keywords)
             
             # Ensure geo is always US to match the URL format
             geo = "US"
             
-            # Build the payload
-            self.pytrends.build_payload(keywords, cat=0, timeframe=timeframe, geo=geo)
+            # Build the payload from canonical keywords so any ordering or casing is the same request
+            self._build_payload(list(keywords_key(keywords)), timeframe, geo)
             
             # Add a small delay to avoid rate limiting
             time.sleep(random.uniform(1, 2))
             
             # Get the interest over time data
-            df = self.pytrends.interest_over_time()
+            df = self._request(self.pytrends.interest_over_time)
             
             # Drop isPartial column if it exists
             if 'isPartial' in df.columns:
                 df = df.drop('isPartial', axis=1)
             
-            return df
+            # Label columns as the caller spelled the keywords
+            return remap_columns(df, keywords)
             
         except Exception as e:
             print(f"Error fetching trends data: {str(e)}")
@@ -69,8 +89,7 @@ class TrendsScraper:
         """
         related_topics = {}
         
-        if isinstance(keywords, str):
-            keywords = [k.strip() for k in keywords.split(',')]
+        keywords = parse_keywords(keywords)
         
         # Ensure geo is always US
         geo = "US"
@@ -78,14 +97,15 @@ class TrendsScraper:
         for keyword in keywords:
             try:
                 # Build the payload
-                self.pytrends.build_payload([keyword], cat=0, timeframe=timeframe, geo=geo)
+                canonical = normalize_keyword(keyword)
+                self._build_payload([canonical], timeframe, geo)
                 
                 # Add a small delay to avoid rate limiting
                 time.sleep(random.uniform(1, 2))
                 
                 # Get related topics
-                topics = self.pytrends.related_topics()
-                related_topics[keyword] = topics.get(keyword, {})
+                topics = self._request(self.pytrends.related_topics)
+                related_topics[keyword] = topics.get(canonical, {})
                 
             except Exception as e:
                 print(f"Error fetching related topics for {keyword}: {str(e)}")
@@ -107,8 +127,7 @@ class TrendsScraper:
         """
         related_queries = {}
         
-        if isinstance(keywords, str):
-            keywords = [k.strip() for k in keywords.split(',')]
+        keywords = parse_keywords(keywords)
         
         # Ensure geo is always US
         geo = "US"
@@ -116,14 +135,15 @@ class TrendsScraper:
         for keyword in keywords:
             try:
                 # Build the payload
-                self.pytrends.build_payload([keyword], cat=0, timeframe=timeframe, geo=geo)
+                canonical = normalize_keyword(keyword)
+                self._build_payload([canonical], timeframe, geo)
                 
                 # Add a small delay to avoid rate limiting
                 time.sleep(random.uniform(1, 2))
                 
                 # Get related queries
-                queries = self.pytrends.related_queries()
-                related_queries[keyword] = queries.get(keyword, {})
+                queries = self._request(self.pytrends.related_queries)
+                related_queries[keyword] = queries.get(canonical, {})
                 
             except Exception as e:
                 print(f"Error fetching related queries for {keyword}: {str(e)}")
@@ -131,7 +151,60 @@ class TrendsScraper:
         
         return related_queries
     
-    def get_interest_by_region(self, keywords, timeframe="now 7-d", geo="US", resolution="REGION"):
+    def get_related_store(self, keywords, timeframe="now 7-d", geo="US"):
+        """
+        Get related topics and queries as a single long-format table.
+        
+        Topics and queries for a keyword are fetched from the same payload,
+        so this needs half the payload requests of calling
+        get_related_topics and get_related_queries separately.
+        
+        Args:
+            keywords (list): List of keywords to get data for
+            timeframe (str): Time frame to retrieve data
+            geo (str): Geographic location (always US)
+            
+        Returns:
+            RelatedStore: Related topics and queries for all keywords; keywords whose
+                fetch raised are listed in its failed attribute
+        """
+        related_topics = {}
+        related_queries = {}
+        failed = []
+        
+        keywords = parse_keywords(keywords)
+        
+        # Ensure geo is always US
+        geo = "US"
+        
+        fetched_at = pd.Timestamp.now()
+        for keyword in keywords:
+            try:
+                # Build the payload
+                canonical = normalize_keyword(keyword)
+                self._build_payload([canonical], timeframe, geo)
+                
+                # Add a small delay to avoid rate limiting
+                time.sleep(random.uniform(1, 2))
+            except Exception as e:
+                print(f"Error fetching related data for {keyword}: {str(e)}")
+                failed += [(keyword, 'topic'), (keyword, 'query')]
+                continue
+            
+            # Topics and queries are fetched separately, so one failing keeps the other
+            for source, method, results in (
+                ('topic', self.pytrends.related_topics, related_topics),
+                ('query', self.pytrends.related_queries, related_queries)
+            ):
+                try:
+                    results[keyword] = self._request(method).get(canonical, {})
+                except Exception as e:
+                    print(f"Error fetching related {source} data for {keyword}: {str(e)}")
+                    failed.append((keyword, source))
+        
+        return RelatedStore.from_related(related_topics, related_queries, fetched_at, failed=failed)
+    
+    def get_interest_by_region(self, keywords, timeframe="now 7-d", geo="US", resolution="REGION", inc_geo_code=False):
         """
         Get interest by region using format: trends.google.com/trends/explore?geo=US&q=keywords
         
@@ -140,28 +213,58 @@ class TrendsScraper:
             timeframe (str): Time frame to retrieve data
             geo (str): Geographic location (always US)
             resolution (str): Resolution of the data (COUNTRY, REGION, CITY, DMA)
+            inc_geo_code (bool): Include region codes (or city coordinates) for mapping
             
         Returns:
             pandas.DataFrame: DataFrame containing interest by region data
         """
         try:
-            if isinstance(keywords, str):
-                keywords = [k.strip() for k in keywords.split(',')]
+            keywords = parse_keywords(keywords)
             
             # Ensure geo is always US
             geo = "US"
             
-            # Build the payload
-            self.pytrends.build_payload(keywords, cat=0, timeframe=timeframe, geo=geo)
+            # Build the payload from canonical keywords so any ordering or casing is the same request
+            self._build_payload(list(keywords_key(keywords)), timeframe, geo)
             
             # Add a small delay to avoid rate limiting
             time.sleep(random.uniform(1, 2))
             
             # Get interest by region
-            df = self.pytrends.interest_by_region(resolution=resolution, inc_low_vol=True)
+            df = self._request(
+                self.pytrends.interest_by_region,
+                resolution=resolution, inc_low_vol=True, inc_geo_code=inc_geo_code
+            )
             
-            return df
+            return remap_columns(df, keywords)
             
         except Exception as e:
             print(f"Error fetching regional data: {str(e)}")
             return pd.DataFrame()
+
+
+class ThreadScrapers:
+    """Hands each thread its own TrendsScraper; pytrends clients are not thread-safe."""
+
+    def __init__(self, budget=None):
+        """
+        Initialize with no scrapers yet; each thread's is created on first use.
+
+        Args:
+            budget (RequestBudget): Optional request budget shared by every thread's scraper
+        """
+        self.budget = budget
+        self._local = threading.local()
+
+    def get(self):
+        """
+        Return the calling thread's scraper.
+
+        Returns:
+            TrendsScraper: Scraper owned by the current thread
+        """
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            scraper = TrendsScraper(budget=self.budget)
+            self._local.scraper = scraper
+        return scraper
@@ -217,4 +217,88 @@ def create_comparison_chart(df1, df2, title1, title2):
         margin=dict(l=40, r=40, t=60, b=40)
     )
     
+    return fig
+
+def get_region_choropleth(df, keyword, title=None):
+    """
+    Create a US state choropleth of interest in a keyword.
+    
+    Args:
+        df (pandas.DataFrame): State-level interest, either with a 'geoCode' column
+            or indexed by region code (e.g. 'US-CA')
+        keyword (str): Column to color the map by
+        title (str): Map title (defaults to the keyword)
+        
+    Returns:
+        plotly.graph_objects.Figure: Plotly figure object
+    """
+    codes = df['geoCode'] if 'geoCode' in df.columns else df.index.to_series()
+    
+    fig = go.Figure(
+        go.Choropleth(
+            locations=codes.str.replace('US-', '', regex=False),
+            z=df[keyword],
+            locationmode='USA-states',
+            colorscale='Blues',
+            zmin=0,
+            zmax=100,
+            text=df.index,
+            hovertemplate='<b>%{text}</b><br>Interest: %{z}<extra></extra>',
+            colorbar_title='Interest'
+        )
+    )
+    
+    fig.update_layout(
+        title={
+            'text': title or f"Interest in '{keyword}' by State",
+            'x': 0.5,
+            'xanchor': 'center'
+        },
+        geo=dict(scope='usa'),
+        margin=dict(l=20, r=20, t=60, b=20),
+        height=500
+    )
+    
+    return fig
+
+def get_city_map(df, keyword):
+    """
+    Create a US map with a marker per city sized by interest in a keyword.
+    
+    Args:
+        df (pandas.DataFrame): City-level interest with 'lat' and 'lng' columns
+        keyword (str): Column to size and color the markers by
+        
+    Returns:
+        plotly.graph_objects.Figure: Plotly figure object
+    """
+    fig = go.Figure(
+        go.Scattergeo(
+            lat=df['lat'],
+            lon=df['lng'],
+            text=df.index,
+            marker=dict(
+                size=df[keyword] / 4 + 4,
+                color=df[keyword],
+                colorscale='Blues',
+                cmin=0,
+                cmax=100,
+                line=dict(width=0.5, color='white')
+            ),
+            customdata=df[keyword],
+            hovertemplate='<b>%{text}</b><br>Interest: %{customdata}<extra></extra>'
+        )
+    )
+    
+    fig.update_layout(
+        title={
+            'text': f"Interest in '{keyword}' by City",
+            'x': 0.5,
+            'xanchor': 'center'
+        },
+        geo=dict(scope='usa'),
+        margin=dict(l=20, r=20, t=60, b=20),
+        height=500
+    )
+    
     return fig
\ No newline at end of file
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+from src.keywords import keywords_key
+
+DEFAULT_QUEUE_PATH = os.path.join("data", "queue.db")
+
+Job = namedtuple('Job', ['id', 'kind', 'payload', 'attempts', 'job_key'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    job_key TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claimable ON jobs (status, available_at);
+"""
+
+
+def connect(path):
+    """
+    Open a SQLite connection suitable for sharing between processes on one host.
+
+    WAL journaling relies on shared memory and file locks that network
+    filesystems (NFS, SMB) do not provide reliably, so the file must be on a
+    local disk.
+
+    Args:
+        path (str): Database file
+
+    Returns:
+        sqlite3.Connection: Connection in autocommit mode with WAL journaling; callers
+            sharing it between threads must serialize access themselves
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+def make_job_key(kind, payload, window=None):
+    """
+    Derive an idempotency key from a job's kind and payload.
+
+    Keyword lists are canonicalized first, so jobs for the same keywords in
+    a different order or casing share a key (and therefore a result).
+
+    Args:
+        kind (str): Job kind
+        payload (dict): JSON-serializable job payload
+        window (int): Freshness window the key belongs to; the same job in another window gets another key
+
+    Returns:
+        str: Hex digest; identical jobs get identical keys
+    """
+    payload = dict(payload)
+    if 'keywords' in payload:
+        payload['keywords'] = list(keywords_key(payload['keywords']))
+
+    body = json.dumps([kind, payload, window], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+class WorkQueue:
+    """Durable job queue in SQLite that several worker processes on one host can pull from.
+
+    Jobs are claimed with a lease. A worker that dies without completing its
+    job loses the lease when it expires and the job is handed to another
+    worker. Results are only accepted from the current lease holder, so a
+    job completes exactly once even if it ran more than once.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease_seconds=300, max_attempts=3, retry_delay=30, key_window=86400):
+        """
+        Open (and if needed create) the queue.
+
+        Args:
+            path (str): Database file on a local disk (WAL mode does not work over network filesystems)
+            lease_seconds (float): How long a claimed job stays reserved for its worker
+            max_attempts (int): Default number of attempts before a job is marked failed
+            retry_delay (float): Base delay in seconds before a failed job is retried (doubles per attempt)
+            key_window (float): Seconds a derived job key stays valid; an identical job enqueued in a
+                later window runs again instead of returning the old result (None never expires)
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.key_window = key_window
+        self.conn = connect(path)
+        self.conn.executescript(_SCHEMA)
+
+    def enqueue(self, kind, payload, job_key=None, max_attempts=None):
+        """
+        Add a job unless an identical one already exists.
+
+        An identical job that failed permanently is reset to pending and run again.
+
+        Args:
+            kind (str): Job kind, e.g. 'interest' or 'generate'
+            payload (dict): JSON-serializable job arguments
+            job_key (str): Idempotency key (derived from kind, payload and the current key window if omitted)
+            max_attempts (int): Attempts before the job is marked failed
+
+        Returns:
+            int: Id of the new or existing job
+        """
+        now = time.time()
+        if not job_key:
+            window = int(now // self.key_window) if self.key_window else None
+            job_key = make_job_key(kind, payload, window)
+        max_attempts = max_attempts or self.max_attempts
+        self.conn.execute(
+            "INSERT OR IGNORE INTO jobs (kind, payload, job_key, max_attempts, available_at, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, json.dumps(payload), job_key, max_attempts, now, now, now)
+        )
+        self.conn.execute(
+            "UPDATE jobs SET status = 'pending', attempts = 0, max_attempts = ?, available_at = ?,"
+            " error = NULL, updated_at = ? WHERE job_key = ? AND status = 'failed'",
+            (max_attempts, now, now, job_key)
+        )
+        row = self.conn.execute("SELECT id FROM jobs WHERE job_key = ?", (job_key,)).fetchone()
+        return row[0]
+
+    def claim(self, worker_id, kinds=None):
+        """
+        Lease the oldest available job.
+
+        Jobs whose lease has expired are available again; if they have used up
+        their attempts they are marked failed instead.
+
+        Args:
+            worker_id (str): Identifier of the claiming worker
+            kinds (list): Only claim jobs of these kinds
+
+        Returns:
+            Job: The claimed job, or None if there is nothing to do
+        """
+        now = time.time()
+        kind_filter = ""
+        params = [now, now]
+        if kinds:
+            kind_filter = f" AND kind IN ({','.join('?' * len(kinds))})"
+            params.extend(kinds)
+
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can never claim the same job
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired after final attempt', updated_at = ?"
+                " WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+                (now, now)
+            )
+            row = self.conn.execute(
+                "SELECT id, kind, payload, attempts, job_key FROM jobs"
+                " WHERE ((status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires < ?))"
+                + kind_filter + " ORDER BY id LIMIT 1",
+                params
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+
+            self.conn.execute(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?,"
+                " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row[0])
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        return Job(row[0], row[1], json.loads(row[2]), row[3] + 1, row[4])
+
+    def heartbeat(self, job_id, worker_id):
+        """
+        Extend the lease on a job that is still being worked on.
+
+        Args:
+            job_id (int): Job id
+            worker_id (str): Worker holding the lease
+
+        Returns:
+            bool: False if the worker no longer holds the lease
+        """
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ?"
+            " WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (now + self.lease_seconds, now, job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result):
+        """
+        Record a job's result.
+
+        Args:
+            job_id (int): Job id
+            worker_id (str): Worker holding the lease
+            result: JSON-serializable result
+
+        Returns:
+            bool: False if the lease was lost and the result was discarded
+        """
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_owner = NULL,"
+            " lease_expires = NULL, updated_at = ?"
+            " WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (json.dumps(result), time.time(), job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, worker_id, error):
+        """
+        Record a failed attempt, scheduling a retry with exponential backoff if attempts remain.
+
+        Args:
+            job_id (int): Job id
+            worker_id (str): Worker holding the lease
+            error (str): Description of the failure
+
+        Returns:
+            bool: False if the lease was lost
+        """
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE jobs SET"
+            " status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,"
+            " available_at = ? + ? * (1 << (attempts - 1)),"
+            " error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?"
+            " WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+            (now, self.retry_delay, str(error), now, job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        """
+        Look up a job.
+
+        Args:
+            job_id (int): Job id
+
+        Returns:
+            dict: Job fields with the payload and result decoded, or None if there is no such job
+        """
+        self.conn.row_factory = sqlite3.Row
+        try:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            self.conn.row_factory = None
+        if row is None:
+            return None
+
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def counts(self):
+        """dict: Number of jobs per status."""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
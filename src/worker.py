@@ -0,0 +1,239 @@
+"""
+Worker processes that pull scrape and generate jobs from a shared WorkQueue.
+
+Start as many workers as needed on the host holding the queue database
+(SQLite in WAL mode, so it must be on a local disk, not a network
+filesystem); they all draw on one Google Trends request budget:
+
+    python -m src.worker run --db data/queue.db --rate 0.5
+
+Queue jobs and check on them with:
+
+    python -m src.worker enqueue interest '{"keywords": ["AI", "ML"]}'
+    python -m src.worker status --job 1
+"""
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+from src.article_cache import ArticleCache
+from src.article_generator import ArticleGenerator
+from src.dedup import DEFAULT_DEDUP_PATH, SharedDuplicateDetector, generate_distinct_article
+from src.rate_limit import SharedRequestBudget
+from src.topic_index import DEFAULT_INDEX_PATH, TopicIndex
+from src.trends_scraper import TrendsScraper
+from src.work_queue import DEFAULT_QUEUE_PATH, WorkQueue
+
+JOB_KINDS = ('interest', 'related', 'region', 'generate')
+
+
+def _require(df, what):
+    # TrendsScraper reports errors by returning empty results; treat them as
+    # failures so the queue retries the job with backoff
+    if df is None or len(df) == 0:
+        raise RuntimeError(f"No {what} data returned")
+    return df
+
+
+class _LeaseKeeper(threading.Thread):
+    """Renews a job's lease in the background while the job runs."""
+
+    def __init__(self, queue, job_id, worker_id, interval):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            if not self.queue.heartbeat(self.job_id, self.worker_id):
+                print(f"Job {self.job_id} lost its lease")
+                return
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class Worker:
+    """Claims jobs from a WorkQueue and runs them against TrendsScraper and ArticleGenerator."""
+
+    def __init__(self, queue, budget, worker_id=None, article_cache=None, detector=None, topic_index=None):
+        """
+        Initialize the worker.
+
+        Args:
+            queue (WorkQueue): Queue to pull jobs from
+            budget (SharedRequestBudget): Request budget shared by every worker
+            worker_id (str): Unique worker name (defaults to host:pid)
+            article_cache (ArticleCache): Cache used for generate jobs
+            detector (NearDuplicateDetector): Index of generated articles shared by every
+                worker, so generate jobs can regenerate near-duplicates
+            topic_index (TopicIndex): Index that related data from related and generate jobs is added to
+        """
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.scraper = TrendsScraper(budget=budget)
+        self.generator = ArticleGenerator()
+        self.article_cache = article_cache if article_cache is not None else ArticleCache()
+        self.detector = detector if detector is not None else SharedDuplicateDetector()
+        self.topic_index = topic_index if topic_index is not None else TopicIndex.load()
+
+    def _index(self, store):
+        """Add a scrape's related data to the topic index shared with the app and the service."""
+        self.topic_index.ingest_store(store)
+        self.topic_index.flush()
+
+    def handle(self, job):
+        """
+        Run one job.
+
+        Args:
+            job (Job): Claimed job
+
+        Returns:
+            JSON-serializable result
+        """
+        payload = job.payload
+        timeframe = payload.get('timeframe', 'now 7-d')
+        geo = payload.get('geo', 'US')
+
+        if job.kind == 'interest':
+            df = _require(self.scraper.get_interest_over_time(payload['keywords'], timeframe, geo), "interest")
+            return json.loads(df.to_json(orient='split', date_format='iso'))
+
+        if job.kind == 'related':
+            store = _require(self.scraper.get_related_store(payload['keywords'], timeframe, geo), "related")
+            self._index(store)
+            return json.loads(store.table.to_json(orient='split', date_format='iso', index=False))
+
+        if job.kind == 'region':
+            df = _require(self.scraper.get_interest_by_region(
+                payload['keywords'], timeframe, geo,
+                resolution=payload.get('resolution', 'REGION'), inc_geo_code=True
+            ), "regional")
+            return json.loads(df.to_json(orient='split'))
+
+        if job.kind == 'generate':
+            keyword = payload['keyword']
+            store = self.scraper.get_related_store([keyword], timeframe, geo)
+            self._index(store)
+            # Near-duplicates of earlier articles are regenerated with the next seeds,
+            # then the alternate tones; if all collide, the result lists the duplicates
+            article, tone, seed, duplicates = generate_distinct_article(
+                self.generator, self.detector, keyword,
+                store.view(keyword, 'topic'), store.view(keyword, 'query'),
+                tone=payload.get('tone', 'informative'),
+                length=payload.get('length', 'medium'),
+                seed=payload.get('seed', 0),
+                max_attempts=payload.get('max_attempts', 5),
+                alternate_tones=payload.get('alternate_tones', ()),
+                cache=self.article_cache
+            )
+            return {
+                'keyword': keyword,
+                'article': article,
+                'tone': tone,
+                'seed': seed,
+                'duplicates': [{'article_id': article_id, 'similarity': similarity} for article_id, similarity in duplicates]
+            }
+
+        raise ValueError(f"Unknown job kind: {job.kind}")
+
+    def run_once(self):
+        """
+        Claim and run a single job.
+
+        Returns:
+            bool: False if there was no job available
+        """
+        job = self.queue.claim(self.worker_id, kinds=JOB_KINDS)
+        if job is None:
+            return False
+
+        # Long scrapes can outlast a single lease; renew it several times per lease period.
+        # The keeper is stopped before the queue is used again, so the connection is
+        # never used by two threads at once
+        keeper = _LeaseKeeper(self.queue, job.id, self.worker_id, self.queue.lease_seconds / 3)
+        keeper.start()
+        try:
+            result = self.handle(job)
+        except Exception as e:
+            keeper.stop()
+            print(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}: {str(e)}")
+            self.queue.fail(job.id, self.worker_id, str(e))
+            return True
+        keeper.stop()
+
+        if not self.queue.complete(job.id, self.worker_id, result):
+            print(f"Job {job.id} ({job.kind}) lost its lease; result discarded")
+        return True
+
+    def run(self, poll_interval=2.0, drain=False):
+        """
+        Process jobs until interrupted.
+
+        Args:
+            poll_interval (float): Seconds to wait when the queue is empty
+            drain (bool): Exit as soon as the queue is empty
+        """
+        try:
+            while True:
+                if not self.run_once():
+                    if drain:
+                        return
+                    time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run or feed workers that share one Google Trends request budget.")
+    parser.add_argument("--db", default=DEFAULT_QUEUE_PATH, help="Queue database shared by all workers")
+    parser.add_argument("--dedup-db", default=DEFAULT_DEDUP_PATH, help="Near-duplicate index shared with the HTTP service")
+    parser.add_argument("--topic-index", default=DEFAULT_INDEX_PATH, help="Topic index shared with the app and the HTTP service")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Process jobs")
+    run_parser.add_argument("--worker-id", default=None)
+    run_parser.add_argument("--rate", type=float, default=0.5, help="Google Trends requests per second across all workers")
+    run_parser.add_argument("--burst", type=int, default=3, help="Maximum burst of Google Trends requests across all workers")
+    run_parser.add_argument("--lease", type=float, default=300, help="Seconds a claimed job stays reserved")
+    run_parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty")
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Add a job")
+    enqueue_parser.add_argument("kind", choices=JOB_KINDS)
+    enqueue_parser.add_argument("payload", help="JSON job arguments")
+    enqueue_parser.add_argument("--key", default=None,
+                                help="Idempotency key (default: derived from the job and the current day, so identical jobs run once a day)")
+
+    status_parser = subparsers.add_parser("status", help="Show queue or job status")
+    status_parser.add_argument("--job", type=int, default=None)
+
+    args = parser.parse_args()
+    if args.command == "run" and (args.rate <= 0 or args.burst < 1):
+        parser.error("--rate must be positive and --burst at least 1")
+
+    if args.command == "run":
+        queue = WorkQueue(args.db, lease_seconds=args.lease)
+        budget = SharedRequestBudget(args.db, rate=args.rate, burst=args.burst)
+        detector = SharedDuplicateDetector(args.dedup_db)
+        topic_index = TopicIndex.load(args.topic_index)
+        Worker(queue, budget, worker_id=args.worker_id, detector=detector, topic_index=topic_index).run(drain=args.drain)
+    elif args.command == "enqueue":
+        print(WorkQueue(args.db).enqueue(args.kind, json.loads(args.payload), job_key=args.key))
+    elif args.command == "status":
+        queue = WorkQueue(args.db)
+        if args.job is None:
+            print(json.dumps(queue.counts(), indent=2))
+        else:
+            print(json.dumps(queue.get(args.job), indent=2))
+
+
+if __name__ == "__main__":
+    main()